@@ -1,25 +1,69 @@
-from flask import Flask, request, render_template, send_from_directory, redirect, url_for, jsonify
-import subprocess
+from flask import Flask, request, render_template, redirect, url_for, jsonify, g
+import json
 import os
 import time
 
+import browser_pool
+import cache
+import comparison
+import config
+import downloads
+import metrics
+import product_index
+import results_store
+import scheduler
+from jobs import JobManager, FINISHED
+from sites import all_sites, get_site
+
 app = Flask(__name__)
+# Worker threads start with the first request, so only a process that
+# serves the app claims jobs (not e.g. the debug reloader's parent or a
+# script that imports the app)
+job_manager = JobManager()
+
+@app.before_request
+def start_job_workers():
+    job_manager.start()
+
+# Time every request for the app_request_seconds histogram
+@app.before_request
+def start_timer():
+    g.request_started = time.monotonic()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_started' in g:
+        metrics.request_seconds.observe(time.monotonic() - g.request_started, endpoint=request.endpoint or 'unknown')
+    return response
+
+# Define a route for Server-Sent Events (SSE) relaying a job's progress events.
+# Events come from the shared job store, so any worker can stream any job;
+# a reconnecting client resumes after the Last-Event-ID it received.
+@app.route('/stream-data/<job_id>')
+def stream_data(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    after = request.headers.get('Last-Event-ID', 0, type=int)
 
-# Define a route for Server-Sent Events (SSE)
-@app.route('/stream-data/<script_choice>/<keyword>/<num_products>')
-def stream_data(script_choice, keyword, num_products):
     def generate():
-        # Simulate sending data from the scraping process
-        for i in range(int(num_products)):
-            time.sleep(1)  # Simulate a delay in data processing
-            yield f"data: Product {i + 1} for '{keyword}' using '{script_choice}'\n\n"  # Send product data as SSE
+        event_id = after
+        while True:
+            events, done = job_manager.wait_for_events(job_id, event_id)
+            for event_id, event in events:
+                yield f"id: {event_id}\ndata: {json.dumps(event, default=str)}\n\n"
+            if done:
+                job = job_manager.get(job_id)
+                yield f"data: {json.dumps({'event': 'end', 'status': job['status'], 'error': job['error']})}\n\n"
+                break
+            if not events:
+                yield ": keep-alive\n\n"
 
     return app.response_class(generate(), mimetype='text/event-stream')
 
 # Define routes
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', sites=all_sites())
 
 # Route to run the selected script
 @app.route('/run-script', methods=['POST'])
@@ -29,35 +73,218 @@ def run_script():
         script_choice = request.form['script']
         keyword = request.form['keyword']
         num_products = request.form['num_products']
+        use_cache = not request.form.get('refresh')
+        incremental = bool(request.form.get('incremental'))
+        # Serve the search from the product index if it has fresh enough matches
+        index_max_age = None
+        if request.form.get('from_index'):
+            index_max_age = float(request.form.get('max_age') or config.INDEX_MAX_AGE)
 
         print(f"Received script: {script_choice}, keyword: {keyword}, num_products: {num_products}")  # Debugging line
 
-        # Set the output filename based on the selected script
-        if script_choice == 'scraper_1':
-            output_file = 'scraped_products_uniformadvantage.xlsx'
-            subprocess.run(['python', 'www.uniformadvantage.py', keyword, num_products], check=True)
-        elif script_choice == 'scraper_2':
-            output_file = 'scraped_products_wearfigs.xlsx'
-            subprocess.run(['python', 'WearFigs.py', keyword, num_products], check=True)
-        elif script_choice == 'scraper_3':
-            output_file = 'scraped_products_scrubharvard.xlsx'
-            subprocess.run(['python', 'scrubharvard.py', keyword, num_products], check=True)
-
-        print(f"Scraping complete. Data saved to '{output_file}'.")  # Debugging line
+        # Queue the scrape and hand the job id straight back to the client
+        if script_choice == 'all':
+            job = job_manager.submit_fanout(keyword, num_products, use_cache=use_cache, index_max_age=index_max_age)
+        else:
+            job = job_manager.submit(script_choice, keyword, num_products, use_cache=use_cache, incremental=incremental,
+                                     index_max_age=index_max_age)
+        print(f"Queued job {job['job_id']}")  # Debugging line
 
-        # Send a JSON response back to the client with the stream URL
-        return jsonify({"success": True, "stream_url": url_for('stream_data', script_choice=script_choice, keyword=keyword, num_products=num_products)})
+        return jsonify({
+            "success": True,
+            "job_id": job['job_id'],
+            "status_url": url_for('job_status', job_id=job['job_id']),
+            "stream_url": url_for('stream_data', job_id=job['job_id']),
+        })
 
     except Exception as e:
         print(f"Error running script: {e}")  # Debugging line
         return jsonify({"success": False, "error": str(e)})
 
+# Route to search every site (or the listed ones) for a keyword in one job
+@app.route('/fan-out', methods=['POST'])
+def fan_out():
+    data = request.get_json(silent=True) or request.form
+    try:
+        sites = data.get('sites')
+        if isinstance(sites, str):
+            sites = [name.strip() for name in sites.split(',') if name.strip()]
+        job = job_manager.submit_fanout(data['keyword'], data['num_products'], site_names=sites,
+                                        use_cache=not data.get('refresh'))
+    except (KeyError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    print(f"Queued fan-out job {job['job_id']} for {', '.join(job['sites'])}")  # Debugging line
+    return jsonify({
+        "success": True,
+        "job_id": job['job_id'],
+        "sites": {name: child['job_id'] for name, child in job['sites'].items()},
+        "status_url": url_for('job_status', job_id=job['job_id']),
+        "stream_url": url_for('stream_data', job_id=job['job_id']),
+    })
+
+# Route to list all known jobs
+@app.route('/jobs')
+def list_jobs():
+    return jsonify(job_manager.list(request.args.get('limit', 100, type=int)))
+
+# Route to check the status and progress of a job
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify(job)
+
+# Route to fetch the results of a finished job
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if job['status'] != FINISHED:
+        return jsonify({"success": False, "status": job['status'], "error": job['error']}), 409
+    # The file is on the host that ran the job; elsewhere a site's results
+    # are converted from the results database instead
+    if job['site'] != 'all' and not os.path.isfile(os.path.join(config.STATIC_DIR, job['output_file'])):
+        fmt = os.path.splitext(job['output_file'])[1].lstrip('.')
+        download_url = url_for('download_job', job_id=job_id, format=fmt)
+    else:
+        download_url = url_for('download_file', filename=job['output_file'])
+    return jsonify({
+        "success": True,
+        "output_file": job['output_file'],
+        "download_url": download_url,
+    })
+
+# Route to list stored scrape results without re-scraping
+@app.route('/results')
+def list_results():
+    site = request.args.get('site')
+    if site:
+        try:
+            site = get_site(site).name
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+    jobs = results_store.list_jobs(site=site, keyword=request.args.get('keyword'), limit=request.args.get('limit', 50, type=int))
+    return jsonify(jobs)
+
+# Route to fetch the stored products of a past job
+@app.route('/results/<job_id>')
+def stored_results(job_id):
+    job = results_store.get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify({
+        "job": job,
+        "products": results_store.job_products(job_id),
+        "diff": results_store.job_diff(job_id),
+    })
+
+# Route to compare prices and ratings across sites over stored results
+@app.route('/compare')
+def compare_prices():
+    job_ids = request.args.getlist('job_id')
+    if job_ids:
+        jobs = [results_store.get_job(job_id) for job_id in job_ids]
+        if None in jobs:
+            return jsonify({"success": False, "error": "Unknown job"}), 404
+    else:
+        keyword = request.args.get('keyword')
+        if not keyword:
+            return jsonify({"success": False, "error": "Pass a keyword or job_id"}), 400
+        try:
+            names = [name for name in request.args.get('sites', '').split(',') if name]
+            sites = [get_site(name) for name in names] if names else all_sites()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        # The newest finished scrape of the keyword on each site
+        jobs = [job for job in (results_store.latest_job(site.name, keyword) for site in sites) if job]
+    return jsonify(comparison.compare(jobs, top=request.args.get('top', 10, type=int)))
+
+# Route to search every product scraped so far in the local index
+@app.route('/search')
+def search_index():
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({"success": False, "error": "Missing q"}), 400
+    try:
+        names = [name for name in request.args.get('sites', '').split(',') if name]
+        sites = [get_site(name).name for name in names]
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    started = time.perf_counter()
+    matches = product_index.search(query, sites=sites, limit=request.args.get('limit', 20, type=int),
+                                   max_age=request.args.get('max_age', type=float),
+                                   prefix=request.args.get('prefix', type=int) == 1)
+    return jsonify({
+        "query": query,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "count": len(matches),
+        "matches": matches,
+    })
+
+# Route to fetch every stored snapshot of one product page
+@app.route('/products/history')
+def product_history():
+    product_url = request.args.get('url')
+    if not product_url:
+        return jsonify({"success": False, "error": "Missing url"}), 400
+    return jsonify(results_store.product_history(product_url, site=request.args.get('site')))
+
+# Route to inspect the result caches
+@app.route('/cache')
+def cache_stats():
+    return jsonify(cache.stats())
+
+# Route to drop everything from the result caches
+@app.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    cache.clear()
+    return jsonify({"success": True})
+
+# Route to expose the scrape metrics in the Prometheus text format
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Route to check the state of the shared browser pool
+@app.route('/health')
+def health():
+    pool = browser_pool.current_pool()
+    return jsonify({
+        "jobs": job_manager.health(),
+        "browser_pool": pool.health() if pool is not None else None,
+        "domains": scheduler.stats(),
+        "index": product_index.stats(),
+    })
+
 # Route to download the scraped file
 @app.route('/download/<filename>')
 def download_file(filename):
-    # Make sure the directory is correct and the file exists
-    directory = os.path.join(app.root_path, 'static')  # Ensure 'static' folder has the files
-    return send_from_directory(directory, filename)
+    # Make sure the file exists inside the static folder
+    path = downloads.static_file(filename)
+    if path is None:
+        return jsonify({"success": False, "error": "File not found"}), 404
+    return downloads.send(path)
+
+# Route to download a stored job's results in any export format
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    job = results_store.get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if job['status'] != 'finished':
+        return jsonify({"success": False, "status": job['status']}), 409
+    fmt = request.args.get('format', 'xlsx').lower()
+    try:
+        path = downloads.converted(job, fmt)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return downloads.send(path, get_site(job['site']).output_filename(fmt, job_id))
 
 if __name__ == '__main__':
+    # The reloader runs this file in a parent that only watches for changes
+    # and a child that serves; only the child runs scrapes
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_manager.start()
     app.run(host='0.0.0.0', port=1111, debug=True)
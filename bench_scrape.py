@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Scrape benchmark against the offline fixture sites. Each site is scraped
+# in a fresh interpreter (so peak memory is per job) with its own fixture
+# server, SQLite databases and output folder, and the harness reports:
+#
+#   products/sec          products in the job / wall time of run_scrape
+#   p50/p95 latency       per product, from the fixture server receiving the
+#                         first request for the page to the product event
+#   peak RSS              Python process, and the whole process tree
+#                         including the browsers (sampled from /proc)
+#   DB writes             INSERT/UPDATE/DELETE statements the job executed
+#
+#     python bench_scrape.py --products 20 --latency 0.05
+#     python bench_scrape.py --save baseline.json
+#     python bench_scrape.py --compare baseline.json   # exit 1 on a regression
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SITES = ('uniformadvantage', 'wearfigs', 'scrubharvard')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _tree_rss_kb(root_pid):
+    """Resident memory of ``root_pid`` and all its descendants, from /proc."""
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entry}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss[int(entry)] = int(line.split()[1])
+                        break
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class _MemorySampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(name='rss-sampler', daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._done = threading.Event()
+
+    def run(self):
+        if not os.path.isdir('/proc'):
+            return
+        while not self._done.is_set():
+            self.peak_kb = max(self.peak_kb, _tree_rss_kb(os.getpid()))
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# Function to benchmark one site in this process (run in a child interpreter)
+def run_child(args):
+    workdir = tempfile.mkdtemp(prefix='scrape-bench-')
+    try:
+        _bench_site(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _bench_site(args, workdir):
+    os.environ['SCRAPER_DB_BACKEND'] = 'sqlite'
+    os.environ['SCRAPER_SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['SCRAPER_CHECKPOINT_DIR'] = os.path.join(workdir, 'checkpoints')
+    os.environ['SCRAPER_INDEX_PATH'] = os.path.join(workdir, 'index.db')
+    if not args.throttle:
+        os.environ[f'SCRAPER_THROTTLE_{args.child.upper()}'] = '0'
+    if args.no_http:
+        os.environ['SCRAPER_HTTP_FAST_PATH'] = '0'
+
+    import resource
+
+    import browser_pool
+    import config
+    import db
+    import progress
+    from engine import run_scrape
+    from fixture_server import FixtureServer
+    from sites import get_site
+
+    config.STATIC_DIR = workdir
+
+    # Count the write statements SQLite executes (executemany counts each row)
+    db_writes = [0]
+    connect_sqlite = db._connect_sqlite
+
+    def count_writes(statement):
+        if statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            db_writes[0] += 1
+
+    def connect_counting():
+        conn = connect_sqlite()
+        conn.set_trace_callback(count_writes)
+        return conn
+
+    db._connect_sqlite = connect_counting
+
+    server = FixtureServer(latency=args.latency, jitter=args.jitter, products=max(args.products, 1)).start()
+    site = get_site(args.child)
+    site.base_url = server.url(site.name)
+
+    finished = {}
+
+    def sink(event):
+        if event['event'] == 'product':
+            finished[urlparse(event['url']).path] = time.monotonic()
+
+    sampler = _MemorySampler()
+    sampler.start()
+    progress.set_sink(sink)
+    # Start the browsers before the clock so launch time isn't counted
+    browser_pool.get_pool()
+    start = time.monotonic()
+    run_scrape(site, args.keyword, args.products, use_cache=False)
+    elapsed = time.monotonic() - start
+    progress.set_sink(None)
+    db.flush_logs()
+    browser_pool.get_pool().shutdown()
+    sampler.stop()
+    server.stop()
+
+    latencies = [(finished[path] - requested) * 1000 for path, requested in server.first_requested.items() if path in finished]
+    print(json.dumps({
+        'site': site.name,
+        'products': len(finished),
+        'seconds': elapsed,
+        'products_per_sec': len(finished) / elapsed if elapsed else None,
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'python_peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'tree_peak_rss_mb': sampler.peak_kb / 1024 or None,
+        'db_writes': db_writes[0],
+        'http_requests': server.requests,
+    }))
+
+
+def _child_command(args, site):
+    command = [sys.executable, os.path.abspath(__file__), '--child', site, '--products', str(args.products),
+               '--keyword', args.keyword, '--latency', str(args.latency), '--jitter', str(args.jitter)]
+    if args.throttle:
+        command.append('--throttle')
+    if args.no_http:
+        command.append('--no-http')
+    return command
+
+
+def _median(samples, key):
+    values = [sample[key] for sample in samples if sample[key] is not None]
+    return statistics.median(values) if values else None
+
+
+def run_suite(args):
+    results = {}
+    for site in args.sites:
+        samples = []
+        for _ in range(args.runs):
+            completed = subprocess.run(_child_command(args, site), cwd=BASE_DIR, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{site}: benchmark failed\n{completed.stderr.strip()}", file=sys.stderr)
+                break
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        if samples:
+            results[site] = {key: _median(samples, key) for key in samples[0] if key != 'site'}
+    return results
+
+
+def print_report(results):
+    print(f"{'site':<18} {'products':>8} {'prod/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'py RSS MB':>10} {'tree RSS MB':>12} {'DB writes':>10}")
+
+    def number(value, digits=1):
+        return '-' if value is None else f"{value:.{digits}f}"
+
+    for site, result in results.items():
+        print(f"{site:<18} {result['products']:>8.0f} {number(result['products_per_sec'], 2):>8} "
+              f"{number(result['p50_ms']):>8} {number(result['p95_ms']):>8} "
+              f"{number(result['python_peak_rss_mb']):>10} {number(result['tree_peak_rss_mb']):>12} "
+              f"{result['db_writes']:>10.0f}")
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against ``baseline`` beyond ``tolerance`` (a fraction)."""
+    regressions = []
+    # metric -> True when higher is better
+    metrics = {'products_per_sec': True, 'p95_ms': False, 'tree_peak_rss_mb': False, 'db_writes': False}
+    for site, result in results.items():
+        for metric, higher_is_better in metrics.items():
+            old, new = baseline.get(site, {}).get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{site} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against the offline fixture sites.")
+    parser.add_argument('--sites', nargs='+', default=list(SITES), choices=SITES)
+    parser.add_argument('--products', type=int, default=20, help="products scraped per job")
+    parser.add_argument('--keyword', default='scrub top')
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds the fixture server adds to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra random seconds per response")
+    parser.add_argument('--runs', type=int, default=1, help="jobs per site; the median of each metric is reported")
+    parser.add_argument('--throttle', action='store_true', help="keep the configured per-site throttle")
+    parser.add_argument('--no-http', action='store_true', help="disable the HTTP fast path")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="fail if the results regressed against this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed regression as a fraction")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = run_suite(args)
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions or len(results) < len(args.sites):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
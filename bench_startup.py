@@ -0,0 +1,93 @@
+import json
+import os
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Startup benchmark for the app and scraper entry points. Every sample runs
+# in a fresh interpreter, so the numbers are cold imports as a new worker
+# process or a `python scrape.py ...` run would see them. The children run
+# no job workers and keep their databases in a temporary folder, so they
+# never claim real queued jobs or write to the repository.
+#
+#     python bench_startup.py [runs]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ['playwright', 'pandas', 'mysql.connector', 'openpyxl', 'pyarrow', 'requests', 'lxml']
+
+# Code run in the child: import the entry point, then time the first
+# thing it has to do
+ENTRY_POINTS = {
+    'app': (
+        "import app",
+        "client = app.app.test_client(); client.get('/'); client.get('/health')",
+    ),
+    'scrape': (
+        "import scrape",
+        "from sites import get_site; get_site('scraper_1')",
+    ),
+    'jobs': (
+        "import jobs",
+        "jobs.JobManager(max_workers=0)",
+    ),
+    'sites': (
+        "import sites",
+        "sites.all_sites()",
+    ),
+}
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+{setup}
+imported = time.perf_counter()
+{first_request}
+done = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - imported) * 1000,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+# Function to time one entry point in a fresh interpreter
+def run_once(setup, first_request):
+    code = CHILD.format(setup=setup, first_request=first_request, heavy=HEAVY_MODULES)
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    env = dict(
+        os.environ,
+        SCRAPER_JOB_WORKERS='0',
+        SCRAPER_JOB_STORE_PATH=os.path.join(workdir, 'jobs.db'),
+        SCRAPER_INDEX_PATH=os.path.join(workdir, 'product_index.db'),
+        SCRAPER_SQLITE_PATH=os.path.join(workdir, 'scrapefly.db'),
+        SCRAPER_CHECKPOINT_DIR=os.path.join(workdir, 'checkpoints'),
+        SCRAPER_DOWNLOAD_CACHE_DIR=os.path.join(workdir, 'download_cache'),
+    )
+    try:
+        output = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, env=env, capture_output=True, text=True,
+                                check=True).stdout
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs=5):
+    print(f"{'entry point':<12} {'import ms':>10} {'first request ms':>17}  heavy modules loaded")
+    for name, (setup, first_request) in ENTRY_POINTS.items():
+        try:
+            samples = [run_once(setup, first_request) for _ in range(runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<12} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        import_ms = statistics.median(sample['import_ms'] for sample in samples)
+        first_request_ms = statistics.median(sample['first_request_ms'] for sample in samples)
+        heavy = ', '.join(samples[0]['heavy_modules']) or '-'
+        print(f"{name:<12} {import_ms:>10.1f} {first_request_ms:>17.1f}  {heavy}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,207 @@
+import atexit
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+import config
+import metrics
+
+
+class BrowserPoolError(RuntimeError):
+    """Raised for tasks submitted to a pool whose browser workers have all stopped."""
+
+
+class _BrowserWorker(threading.Thread):
+    """Owns one Playwright instance and Chromium for the life of the pool.
+
+    Playwright's sync API is bound to the thread that started it, so tasks
+    are handed to the worker through the pool queue and executed here, each
+    one inside a fresh, isolated browser context.
+    """
+
+    def __init__(self, pool, number):
+        super().__init__(name=f'browser-{number}', daemon=True)
+        self.pool = pool
+        self.browser = None
+        self.uses = 0
+        self.launches = 0
+        self.busy = False
+        self.error = None
+
+    def _ensure_browser(self, playwright):
+        healthy = self.browser is not None and self.browser.is_connected()
+        if healthy and self.uses < self.pool.max_uses:
+            return
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception as e:
+                print(f"{self.name}: error while closing browser: {e}")
+        with metrics.timer('browser_launch', site=''):
+            self.browser = playwright.chromium.launch(headless=self.pool.headless)
+        self.uses = 0
+        self.launches += 1
+
+    def run(self):
+        try:
+            self._serve()
+        except BaseException as e:
+            # E.g. Playwright isn't installed or couldn't start
+            print(f"{self.name}: stopped: {e}")
+            self.error = e
+        finally:
+            self.pool._worker_stopped(self)
+
+    def _serve(self):
+        # Playwright is only imported once a browser is actually needed
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            # Launch straight away so the first task finds a warm browser
+            try:
+                self._ensure_browser(p)
+            except Exception as e:
+                print(f"{self.name}: error while launching browser: {e}")
+
+            while True:
+                item = self.pool.tasks.get()
+                if item is None:
+                    break
+                fn, future, ctx = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                self.busy = True
+                try:
+                    self._ensure_browser(p)
+                    with metrics.timer('context_create', site=''):
+                        context = self.browser.new_context()
+                except BaseException as e:
+                    self.busy = False
+                    future.set_exception(e)
+                    continue
+
+                try:
+                    result = ctx.run(fn, context)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+                finally:
+                    try:
+                        context.close()
+                    except Exception as e:
+                        print(f"{self.name}: error while closing context: {e}")
+                    self.uses += 1
+                    self.busy = False
+
+            if self.browser is not None and self.browser.is_connected():
+                self.browser.close()
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'alive': self.is_alive(),
+            'connected': self.browser is not None and self.browser.is_connected(),
+            'busy': self.busy,
+            'uses': self.uses,
+            'launches': self.launches,
+            'error': str(self.error) if self.error is not None else None,
+        }
+
+
+class BrowserPool:
+    """A fixed set of warm browsers that run scrape tasks for any job.
+
+    ``submit(fn)`` queues ``fn(context)`` to run on the next free browser
+    with a new browser context and returns a Future for its result.
+    Browsers are launched when the pool starts, relaunched if they
+    disconnect and recycled after ``max_uses`` tasks. Once every worker
+    has stopped, queued and new tasks fail with BrowserPoolError instead
+    of waiting forever.
+    """
+
+    def __init__(self, size=config.BROWSER_POOL_SIZE, max_uses=config.BROWSER_MAX_USES,
+                 headless=config.BROWSER_HEADLESS):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.tasks = queue.Queue()
+        self.error = None
+        self._lock = threading.Lock()
+        self._workers = [_BrowserWorker(self, n) for n in range(size)]
+        self._alive = len(self._workers)
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def alive(self):
+        with self._lock:
+            return self._alive > 0
+
+    def submit(self, fn):
+        future = Future()
+        with self._lock:
+            if self._alive == 0:
+                future.set_exception(self.error)
+                return future
+            # Carry the caller's context along so progress events raised inside
+            # the task still reach the job that submitted it
+            self.tasks.put((fn, future, contextvars.copy_context()))
+        return future
+
+    def _worker_stopped(self, worker):
+        with self._lock:
+            self._alive -= 1
+            if self._alive > 0:
+                return
+            cause = next((w.error for w in self._workers if w.error is not None), None)
+            self.error = BrowserPoolError(f"No browser is available: {cause}" if cause else "The browser pool is shut down")
+        # Nothing will take the queued tasks any more
+        while True:
+            try:
+                item = self.tasks.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(self.error)
+
+    def run(self, fn):
+        return self.submit(fn).result()
+
+    def health(self):
+        return {
+            'size': self.size,
+            'queued': self.tasks.qsize(),
+            'workers': [worker.stats() for worker in self._workers],
+        }
+
+    def shutdown(self):
+        for _ in self._workers:
+            self.tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=30)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide browser pool, starting it on first use.
+
+    A pool whose browsers all failed is replaced, so the next job tries
+    to start them again.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or not _pool.alive:
+            _pool = BrowserPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def current_pool():
+    """Return the browser pool if it has been started, without starting it."""
+    return _pool
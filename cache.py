@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from results_store import normalize_keyword
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Whole search results: (site, keyword, num_products) -> [(url, product), ...]
+search_cache = TTLCache(config.SEARCH_CACHE_SIZE, config.SEARCH_CACHE_TTL)
+
+# Single product pages: product URL -> product dict
+product_cache = TTLCache(config.PRODUCT_CACHE_SIZE, config.PRODUCT_CACHE_TTL)
+
+
+def search_key(site, keyword, num_products):
+    return (site, normalize_keyword(keyword), int(num_products))
+
+
+def stats():
+    return {'search': search_cache.stats(), 'products': product_cache.stats()}
+
+
+def clear():
+    search_cache.clear()
+    product_cache.clear()
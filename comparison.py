@@ -0,0 +1,89 @@
+import results_store
+from normalize import normalize_frame
+from sites import get_site
+
+# Cross-site price comparison over stored scrape results. Each job's
+# products are normalized into one typed DataFrame (see normalize.py) and
+# the statistics are computed with grouped pandas operations: price and
+# rating figures per site, the cheapest offer for every size, and the
+# cheapest products overall.
+
+# Sizes in the order a size chart lists them; anything else sorts after
+SIZE_ORDER = ['XXS', 'XS', 'S', 'M', 'L', 'XL', '2XL', 'XXL', '3XL', 'XXXL', '4XL', '5XL', '6XL']
+
+
+def load_frame(jobs):
+    """One normalized DataFrame with the stored products of every job in ``jobs``."""
+    import pandas as pd
+
+    frames = []
+    for job in jobs:
+        products = results_store.job_products(job['job_id'])
+        if products:
+            frame = normalize_frame(get_site(job['site']), products)
+            frame['job_id'] = job['job_id']
+            frames.append(frame)
+    if not frames:
+        return None
+    frame = pd.concat(frames, ignore_index=True)
+    frame['site'] = frame['site'].astype('category')
+    return frame
+
+
+def _records(frame):
+    """JSON-ready rows: NA becomes None."""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def site_stats(frame):
+    stats = frame.groupby('site', observed=True).agg(
+        products=('product_url', 'size'),
+        priced=('price', 'count'),
+        min_price=('price', 'min'),
+        median_price=('price', 'median'),
+        mean_price=('price', 'mean'),
+        max_price=('price', 'max'),
+        mean_rating=('rating', 'mean'),
+        reviews=('reviews', 'sum'),
+        mean_discount=('discount', 'mean'),
+    )
+    return _records(stats.round(2).reset_index())
+
+
+def cheapest_per_size(frame):
+    """The lowest priced product offered in each size, in size chart order."""
+    import pandas as pd
+
+    offers = frame[['site', 'name', 'price', 'product_url', 'sizes']].dropna(subset=['price']).explode('sizes')
+    offers = offers.dropna(subset=['sizes'])
+    if offers.empty:
+        return []
+    known = [size for size in SIZE_ORDER if size in set(offers['sizes'])]
+    others = sorted(set(offers['sizes']) - set(known))
+    offers['sizes'] = pd.Categorical(offers['sizes'], categories=known + others, ordered=True)
+    cheapest = offers.sort_values('price', kind='stable').drop_duplicates('sizes').sort_values('sizes')
+    offers_per_size = offers.groupby('sizes', observed=True)['product_url'].size()
+    cheapest = cheapest.rename(columns={'sizes': 'size'})
+    cheapest['offers'] = cheapest['size'].map(offers_per_size).astype('int64')
+    cheapest['size'] = cheapest['size'].astype(str)
+    return _records(cheapest[['size', 'site', 'name', 'price', 'offers', 'product_url']])
+
+
+def cheapest_products(frame, top=10):
+    columns = ['site', 'name', 'price', 'original_price', 'discount', 'rating', 'product_url']
+    return _records(frame.nsmallest(top, 'price')[columns].round({'discount': 3}))
+
+
+def compare(jobs, top=10):
+    """The price comparison report over the products of ``jobs``."""
+    frame = load_frame(jobs)
+    if frame is None:
+        return {'jobs': [job['job_id'] for job in jobs], 'products': 0,
+                'sites': [], 'cheapest_per_size': [], 'cheapest': []}
+    return {
+        'jobs': [job['job_id'] for job in jobs],
+        'products': len(frame),
+        'sites': site_stats(frame),
+        'cheapest_per_size': cheapest_per_size(frame),
+        'cheapest': cheapest_products(frame, top),
+    }
@@ -0,0 +1,138 @@
+import os
+
+# Base folders used by the app and the scrapers
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+CHECKPOINT_DIR = os.environ.get('SCRAPER_CHECKPOINT_DIR', os.path.join(BASE_DIR, 'checkpoints'))
+# Checkpoints of crashed scrapes older than this many seconds are discarded
+# instead of resumed
+CHECKPOINT_MAX_AGE = float(os.environ.get('SCRAPER_CHECKPOINT_MAX_AGE', '86400'))
+
+# Files each scrape exports to: csv, jsonl and parquet are written row by
+# row as products are scraped, xlsx once the scrape is complete. The first
+# one is the job's output file.
+EXPORT_FORMATS = [fmt.strip() for fmt in os.environ.get('SCRAPER_EXPORT_FORMATS', 'xlsx,csv').split(',') if fmt.strip()]
+
+# Job results converted to another format (and gzipped text files) for
+# /download are kept here; the oldest are removed beyond this many MB
+DOWNLOAD_CACHE_DIR = os.environ.get('SCRAPER_DOWNLOAD_CACHE_DIR', os.path.join(BASE_DIR, 'download_cache'))
+DOWNLOAD_CACHE_BYTES = int(float(os.environ.get('SCRAPER_DOWNLOAD_CACHE_MB', '256')) * 1024 * 1024)
+
+# Each job's export files in STATIC_DIR are removed after this many days,
+# and the oldest ones once they add up to more than this many MB (0
+# disables either limit). Finished jobs can still be downloaded from the
+# results database.
+STATIC_RETENTION_SECONDS = float(os.environ.get('SCRAPER_STATIC_RETENTION_DAYS', '7')) * 24 * 3600
+STATIC_MAX_BYTES = int(float(os.environ.get('SCRAPER_STATIC_MAX_MB', '1024')) * 1024 * 1024)
+
+# Number of scrapes each process runs at the same time. Every site of a
+# search across all retailers counts as one scrape, so those sites are only
+# all searched at once when this is at least the number of sites
+JOB_WORKERS = int(os.environ.get('SCRAPER_JOB_WORKERS', '3'))
+
+# Where job state, progress events and the job queue are kept so several
+# web and worker processes can share them: 'sqlite' (a local file every
+# process on the host opens) or 'database' (the results database, e.g. a
+# MySQL server reachable from every host). Set SCRAPER_JOB_WORKERS=0 on
+# web processes that should only accept requests and leave the scraping
+# to `python worker.py`
+JOB_STORE = os.environ.get('SCRAPER_JOB_STORE', 'sqlite')
+JOB_STORE_PATH = os.environ.get('SCRAPER_JOB_STORE_PATH', os.path.join(BASE_DIR, 'jobs.db'))
+
+# Idle workers and event streams check the job store this often (seconds);
+# running jobs save their progress every JOB_HEARTBEAT_SECONDS, and one that
+# hasn't for JOB_STALE_SECONDS is failed as its worker is gone
+JOB_POLL_SECONDS = float(os.environ.get('SCRAPER_JOB_POLL_SECONDS', '1'))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get('SCRAPER_JOB_HEARTBEAT_SECONDS', '5'))
+JOB_STALE_SECONDS = float(os.environ.get('SCRAPER_JOB_STALE_SECONDS', '60'))
+
+# Finished and failed jobs and their events are deleted from the job store
+# this many days after they ended (their results stay in the results store)
+JOB_RETENTION_SECONDS = float(os.environ.get('SCRAPER_JOB_RETENTION_DAYS', '7')) * 24 * 3600
+
+# Number of product pages each scrape fetches in parallel
+PAGE_CONCURRENCY = int(os.environ.get('SCRAPER_PAGE_CONCURRENCY', '4'))
+
+# Product links discovered but not yet picked up by the job; link
+# discovery waits when this many are queued
+LINK_QUEUE_SIZE = int(os.environ.get('SCRAPER_LINK_QUEUE_SIZE', '50'))
+
+# Minimum number of seconds between two page loads on the same site. Can be
+# overridden per site, e.g. SCRAPER_THROTTLE_WEARFIGS=1.5
+THROTTLE_SECONDS = float(os.environ.get('SCRAPER_THROTTLE_SECONDS', '0.5'))
+
+
+def site_throttle(site):
+    """Politeness delay in seconds for ``site``."""
+    return float(os.environ.get(f'SCRAPER_THROTTLE_{site.upper()}', THROTTLE_SECONDS))
+
+# Per-domain request scheduling (see scheduler.py). The throttle above sets
+# each domain's starting rate, which then adapts between RATE_MIN and
+# RATE_MAX requests per second; responses slower than TARGET_LATENCY
+# seconds lower it
+RATE_MAX = float(os.environ.get('SCRAPER_RATE_MAX', '4'))
+RATE_MIN = float(os.environ.get('SCRAPER_RATE_MIN', '0.2'))
+RATE_BURST = int(os.environ.get('SCRAPER_RATE_BURST', '2'))
+TARGET_LATENCY = float(os.environ.get('SCRAPER_TARGET_LATENCY', '5'))
+
+# Failed requests are retried this many times, waiting a random time of up
+# to BACKOFF_BASE * 2^attempt seconds (at most BACKOFF_MAX) in between
+RETRIES = int(os.environ.get('SCRAPER_RETRIES', '2'))
+BACKOFF_BASE = float(os.environ.get('SCRAPER_BACKOFF_BASE', '1'))
+BACKOFF_MAX = float(os.environ.get('SCRAPER_BACKOFF_MAX', '30'))
+
+# After this many failed requests in a row a domain gets no requests for
+# BREAKER_COOLDOWN seconds, then a single probe decides whether to resume
+BREAKER_FAILURES = int(os.environ.get('SCRAPER_BREAKER_FAILURES', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('SCRAPER_BREAKER_COOLDOWN', '60'))
+
+# Long-lived browsers shared by every scrape job
+BROWSER_POOL_SIZE = int(os.environ.get('SCRAPER_BROWSER_POOL_SIZE', str(PAGE_CONCURRENCY)))
+BROWSER_MAX_USES = int(os.environ.get('SCRAPER_BROWSER_MAX_USES', '50'))  # recycle a browser after this many tasks
+BROWSER_HEADLESS = os.environ.get('SCRAPER_HEADLESS', '1') != '0'
+
+# Seconds to wait for an infinite-scroll result grid to grow before giving up
+SCROLL_TIMEOUT = float(os.environ.get('SCRAPER_SCROLL_TIMEOUT', '5'))
+
+# MySQL database the scrapers write their products and logs into
+MYSQL = {
+    'host': os.environ.get('MYSQL_HOST', 'localhost'),
+    'user': os.environ.get('MYSQL_USER', 'root'),
+    'password': os.environ.get('MYSQL_PASSWORD', ''),
+    'database': os.environ.get('MYSQL_DATABASE', 'scrapefly'),
+}
+
+# Database backend: 'mysql', or 'sqlite' for a local stand-in file that
+# needs no server (handy for development and tests)
+DB_BACKEND = os.environ.get('SCRAPER_DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('SCRAPER_SQLITE_PATH', os.path.join(BASE_DIR, 'scrapefly.db'))
+DB_POOL_SIZE = int(os.environ.get('SCRAPER_DB_POOL_SIZE', '5'))
+
+# Log lines are buffered and written in batches of this size, or after
+# this many seconds, whichever comes first
+LOG_BATCH_SIZE = int(os.environ.get('SCRAPER_LOG_BATCH_SIZE', '50'))
+LOG_FLUSH_SECONDS = float(os.environ.get('SCRAPER_LOG_FLUSH_SECONDS', '2'))
+
+# Cached search results, keyed on (site, keyword, number of products)
+SEARCH_CACHE_TTL = float(os.environ.get('SCRAPER_SEARCH_CACHE_TTL', '3600'))
+SEARCH_CACHE_SIZE = int(os.environ.get('SCRAPER_SEARCH_CACHE_SIZE', '256'))
+
+# Cached product pages, keyed on product URL
+PRODUCT_CACHE_TTL = float(os.environ.get('SCRAPER_PRODUCT_CACHE_TTL', '3600'))
+PRODUCT_CACHE_SIZE = int(os.environ.get('SCRAPER_PRODUCT_CACHE_SIZE', '5000'))
+
+# Full-text index of every scraped product (see product_index.py). A
+# search asked to answer from the index is served from it when enough
+# matching products were scraped within INDEX_MAX_AGE seconds
+INDEX_PATH = os.environ.get('SCRAPER_INDEX_PATH', os.path.join(BASE_DIR, 'product_index.db'))
+INDEX_MAX_AGE = float(os.environ.get('SCRAPER_INDEX_MAX_AGE', '86400'))
+
+# Block images, media, fonts and trackers while scraping (0 to load everything)
+BLOCK_RESOURCES = os.environ.get('SCRAPER_BLOCK_RESOURCES', '1') != '0'
+
+# Folder each job's stage timeline is written to as <job_id>.json (unset to skip)
+PROFILE_DIR = os.environ.get('SCRAPER_PROFILE_DIR', '')
+
+# Try plain HTTP + HTML parsing before opening product pages in a browser
+HTTP_FAST_PATH = os.environ.get('SCRAPER_HTTP_FAST_PATH', '1') != '0'
+HTTP_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_TIMEOUT', '15'))
@@ -0,0 +1,181 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+import metrics
+
+
+class ConnectionPool:
+    """A small pool of reusable database connections.
+
+    Connections are opened lazily up to ``size`` and handed back to the
+    pool after use; a connection that raised is dropped instead of reused.
+    """
+
+    def __init__(self, factory, size):
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                # MySQL drops idle connections after a while
+                if hasattr(conn, 'is_connected') and not conn.is_connected():
+                    conn = self._factory()
+            except queue.Empty:
+                conn = self._factory()
+            try:
+                yield conn
+            except BaseException:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+def _connect_mysql():
+    import mysql.connector
+    return mysql.connector.connect(**config.MYSQL)
+
+
+def _connect_sqlite():
+    return sqlite3.connect(config.SQLITE_PATH, check_same_thread=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_sqlite_tables = set()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            factory = _connect_sqlite if config.DB_BACKEND == 'sqlite' else _connect_mysql
+            _pool = ConnectionPool(factory, config.DB_POOL_SIZE)
+        return _pool
+
+
+def sql(query):
+    # Queries are written for MySQL; SQLite uses ? placeholders
+    return query.replace('%s', '?') if config.DB_BACKEND == 'sqlite' else query
+
+
+def create_index(cursor, name, table, columns, sqlite=None):
+    """Create an index unless it exists (``sqlite`` defaults to the configured backend)."""
+    if sqlite is None:
+        sqlite = config.DB_BACKEND == 'sqlite'
+    if sqlite:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+    # MySQL has no CREATE INDEX IF NOT EXISTS
+    try:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    except Exception as e:
+        if getattr(e, 'errno', None) != 1061:  # duplicate key name
+            raise
+
+
+def _ensure_sqlite_table(conn, table, columns):
+    # The SQLite stand-in creates the tables the MySQL database already has
+    if config.DB_BACKEND != 'sqlite' or table in _sqlite_tables:
+        return
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+    _sqlite_tables.add(table)
+
+
+# Function to run a batch of inserts on one pooled connection
+def execute_many(table, columns, rows):
+    """Inserts ``rows`` (tuples in ``columns`` order) into ``table`` with executemany."""
+    if not rows:
+        return
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql_query = sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})")
+    with get_pool().connection() as conn:
+        _ensure_sqlite_table(conn, table, columns)
+        cursor = conn.cursor()
+        cursor.executemany(sql_query, rows)
+        conn.commit()
+        cursor.close()
+    metrics.db_rows_total.inc(len(rows), table=table)
+
+
+class LogBuffer:
+    """Collects log lines in memory and writes them in batches.
+
+    A batch is flushed once ``batch_size`` lines are waiting or the oldest
+    waiting line is ``flush_seconds`` old, with one executemany per log
+    table instead of one connection per line.
+    """
+
+    def __init__(self, batch_size=config.LOG_BATCH_SIZE, flush_seconds=config.LOG_FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._lines = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name='log-flusher', daemon=True)
+        self._flusher.start()
+
+    def add(self, table, message):
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._lines.append((table, message, timestamp))
+            full = len(self._lines) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _flush_periodically(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        # Flushes run one at a time so that when flush() returns every line
+        # queued before the call has been written
+        with self._flush_lock:
+            with self._lock:
+                lines, self._lines = self._lines, []
+            by_table = {}
+            for table, message, timestamp in lines:
+                by_table.setdefault(table, []).append((message, timestamp))
+            for table, rows in by_table.items():
+                try:
+                    execute_many(table, ['log_message', 'log_timestamp'], rows)
+                except Exception as err:
+                    print(f"Database Error: {err}")  # Log database errors to console
+
+
+_log_buffer = None
+
+
+# Function to log messages with timestamp
+def log_message(table, message):
+    """Queues a log message with a timestamp for ``table``."""
+    global _log_buffer
+    print(f"Log: {message}")  # Print log message to console for visibility
+    with _pool_lock:
+        if _log_buffer is None:
+            _log_buffer = LogBuffer()
+            atexit.register(_log_buffer.flush)
+    _log_buffer.add(table, message)
+
+
+# Function to write out any buffered log lines straight away
+def flush_logs():
+    if _log_buffer is not None:
+        _log_buffer.flush()
@@ -0,0 +1,160 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+
+from flask import request, send_file
+from werkzeug.security import safe_join
+
+import config
+import export
+import results_store
+from sites import get_site
+
+# Serving result files. Downloads carry ETag and Last-Modified validators
+# so unchanged files are answered with 304 Not Modified, support byte
+# ranges, and text formats are sent gzipped to clients that accept it. A
+# finished job's stored results can also be converted to any export
+# format on demand. Converted files and gzipped copies are kept in
+# DOWNLOAD_CACHE_DIR so a repeated download costs nothing; the least
+# recently used ones are removed once the folder grows past
+# DOWNLOAD_CACHE_BYTES.
+
+TEXT_FORMATS = ('csv', 'json', 'jsonl')
+CONVERSION_FORMATS = export.FORMATS + ('json',)
+MIN_GZIP_BYTES = 1024
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _fmt(path):
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def _touch(path):
+    # Record the use in the access time only: the modification time
+    # stays the file's validator
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+
+def _write_atomically(path, write):
+    """Create ``path`` with ``write(tmp_path)`` so readers never see a partial file."""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def evict(limit=None):
+    """Remove the least recently used cached files until the cache fits in ``limit`` bytes."""
+    limit = config.DOWNLOAD_CACHE_BYTES if limit is None else limit
+    if not os.path.isdir(config.DOWNLOAD_CACHE_DIR):
+        return 0
+    entries = []
+    for entry in os.scandir(config.DOWNLOAD_CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            entries.append((stat.st_atime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def converted(job, fmt):
+    """Path of ``job``'s stored results in ``fmt``, converting them on first use."""
+    if fmt not in CONVERSION_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    os.makedirs(config.DOWNLOAD_CACHE_DIR, exist_ok=True)
+    path = os.path.join(config.DOWNLOAD_CACHE_DIR, f"{job['job_id']}.{fmt}")
+    with _lock(path):
+        if os.path.exists(path):
+            _touch(path)
+            return path
+        site = get_site(job['site'])
+        columns = [export.URL_COLUMN] + list(site.product_fields)
+        products = results_store.job_products(job['job_id'])
+        _write_atomically(path, lambda tmp_path: export.write_file(tmp_path, fmt, columns, products))
+    evict()
+    return path
+
+
+def gzipped(path):
+    """Path of a gzipped copy of ``path``, made again whenever the file changes."""
+    stat = os.stat(path)
+    os.makedirs(config.DOWNLOAD_CACHE_DIR, exist_ok=True)
+    prefix = os.path.basename(path) + '-'
+    gz_path = os.path.join(config.DOWNLOAD_CACHE_DIR, f"{prefix}{stat.st_mtime_ns:x}-{stat.st_size:x}.gz")
+    with _lock(gz_path):
+        if os.path.exists(gz_path):
+            _touch(gz_path)
+            return gz_path
+
+        def compress(tmp_path):
+            with open(path, 'rb') as source, gzip.open(tmp_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target)
+
+        _write_atomically(gz_path, compress)
+        # Copies of earlier versions of the file are no use any more
+        for entry in os.scandir(config.DOWNLOAD_CACHE_DIR):
+            if entry.name.startswith(prefix) and entry.name.endswith('.gz') and entry.path != gz_path:
+                os.remove(entry.path)
+    evict()
+    return gz_path
+
+
+def send(path, download_name=None):
+    """Send ``path`` as an attachment, with validators, ranges and gzip for text formats."""
+    fmt = _fmt(path)
+    stat = os.stat(path)
+    options = {
+        'mimetype': MIMETYPES.get(fmt),
+        'as_attachment': True,
+        'download_name': download_name or os.path.basename(path),
+        'conditional': True,
+        'max_age': 0,
+    }
+    encode = fmt in TEXT_FORMATS and stat.st_size >= MIN_GZIP_BYTES and request.accept_encodings['gzip'] > 0
+    if encode:
+        # The gzipped copy is validated against the original file
+        options['etag'] = f"{stat.st_mtime_ns:x}-{stat.st_size:x}-gzip"
+        options['last_modified'] = stat.st_mtime
+        response = send_file(gzipped(path), **options)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(path, **options)
+    if fmt in TEXT_FORMATS:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def static_file(filename):
+    """Path of ``filename`` in the static folder, or None if it isn't there."""
+    path = safe_join(config.STATIC_DIR, filename)
+    return path if path is not None and os.path.isfile(path) else None
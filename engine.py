@@ -0,0 +1,442 @@
+import os
+import time
+import uuid
+
+import browser_pool
+import cache
+import config
+import db
+import export
+import http_fastpath
+import metrics
+import network_profile
+import pagination
+import pipeline
+import product_index
+import progress
+import results_store
+import scheduler
+from extraction import extract
+from incremental import build_diff, check_not_modified, fingerprint, validators
+
+
+class Site:
+    """A retail site the engine knows how to scrape.
+
+    Subclasses describe the site declaratively (``product_fields``,
+    ``result_selector``, the log table) and override the steps
+    that need real browser work: ``search`` always, and ``iter_links``
+    when the results need more than reading the grid the search landed
+    on, following infinite scroll, a "load more" button or result pages.
+    """
+
+    name = None              # registry key, also used in output file names
+    title = None             # human readable name shown in the form
+    base_url = None
+    product_fields = {}      # field spec for extraction.extract
+    result_selector = None   # one element per product in the search results
+    infinite_scroll = False  # results grid loads more products when scrolled
+    load_more_selector = None  # button that appends the next results to the grid
+    next_page_selector = None  # link to the next page of results
+    name_field = None        # product field holding the product name
+    ready_selector = None    # element that shows a product page has rendered
+    log_table = None         # MySQL table log lines go to, None to only print them
+
+    # Network profile: what to block while loading pages, what must always
+    # load, and which load event page.goto waits for
+    blocked_resource_types = network_profile.DEFAULT_BLOCKED_TYPES
+    blocked_domains = network_profile.TRACKER_DOMAINS
+    allowed_url_patterns = ()
+    wait_until = 'domcontentloaded'
+
+    # HTTP fast path: product pages are first fetched and parsed without a
+    # browser, and only loaded in one when a field the site needs is missing
+    # from the HTML. Sites whose pages are rendered client side turn it off
+    http_fast_path = True
+    http_required_fields = None  # None means the required fields plus name_field
+
+    # Product fields behind each normalized column (see normalize.py) used
+    # when results from several sites are merged
+    normalized_fields = {}
+
+    # Product fields searched in each column of the product index (see
+    # product_index.py): name, features, materials, colors and sizes
+    index_fields = {}
+
+    @property
+    def scheduler(self):
+        """Rate limit, retries and circuit breaker shared by every request to this site's domain."""
+        return scheduler.for_site(self)
+
+    def output_filename(self, fmt='xlsx', job_id=None):
+        # Every job gets its own files so concurrent scrapes of a site
+        # don't overwrite each other's results
+        if job_id:
+            return f"scraped_products_{self.name}_{job_id[:12]}.{fmt}"
+        return f"scraped_products_{self.name}.{fmt}"
+
+    def log(self, message):
+        if self.log_table:
+            db.log_message(self.log_table, message)
+        else:
+            print(message)
+
+    def search(self, page, keyword):
+        """Open the site in ``page`` and submit a search for ``keyword``."""
+        raise NotImplementedError
+
+    def goto(self, page, url):
+        """Load ``url`` in ``page`` as one request of the site's scheduler (rate limited and retried)."""
+        def load():
+            response = page.goto(url, wait_until=self.wait_until)
+            if response is not None:
+                scheduler.check_status(response.status, response.headers)
+            return response
+        return self.scheduler.call(load)
+
+    def iter_links(self, page, num_products):
+        """Yield batches of absolute product URLs from the results in ``page``, up to ``num_products`` in all."""
+        return pagination.iter_result_links(
+            page, self.result_selector, num_products, scroll=self.infinite_scroll,
+            load_more=self.load_more_selector, next_page=self.next_page_selector,
+            goto=lambda url: self.goto(page, url),
+        )
+
+    def http_required(self):
+        if self.http_required_fields is not None:
+            return list(self.http_required_fields)
+        required = [name for name, field in self.product_fields.items() if field.get('required')]
+        if self.name_field and self.name_field not in required:
+            required.append(self.name_field)
+        return required
+
+    def http_extract(self, document, product):
+        """Fill in ``product`` (extracted from the raw HTML ``document``) from data only found in the HTML source, like embedded JSON."""
+        return product
+
+    def post_process(self, product):
+        """Adjust a freshly extracted product dict before it is stored."""
+        return product
+
+
+# Function to extract product details from a loaded product page
+def scrape_product(site, page):
+    if site.ready_selector:
+        with metrics.timer('render_wait', url=page.url):
+            page.wait_for_selector(site.ready_selector, timeout=15000)
+    with metrics.timer('extract', url=page.url):
+        product = site.post_process(extract(page, site.product_fields))
+    site.log(f"Product details extracted from {page.url}")
+    return product
+
+
+# Function to search the site and queue the product links as they are found
+def find_product_links(site, page, keyword, links):
+    site.log(f"Searching {site.title} for products related to: {keyword}")
+    with metrics.timer('search'):
+        site.search(page, keyword)
+    with metrics.timer('collect_links'):
+        for batch in site.iter_links(page, links.limit):
+            for product_link in batch:
+                links.put(product_link)
+            if links.full or links.cancelled:
+                return
+
+
+def discover_links(site, pool, keyword, num_products, stats=None):
+    """Start link discovery on the browser pool.
+
+    Returns the LinkQueue it fills and the Future of the discovery task.
+    """
+    links = pipeline.LinkQueue(num_products)
+
+    def discover(context):
+        network_profile.apply(context, site, stats)
+        attempt = 0
+        while True:
+            page = context.new_page()
+            try:
+                return find_product_links(site, page, keyword, links)
+            except (scheduler.RequestFailed, scheduler.CircuitOpenError, scheduler.PermanentError):
+                # Page loads are scheduled and retried on their own
+                raise
+            except Exception as e:
+                # Anything else (a search box that didn't appear, a grid that
+                # didn't render) is retried on a fresh page; links found by
+                # an earlier attempt are not queued twice
+                if attempt >= config.RETRIES or links.cancelled:
+                    raise
+                delay = site.scheduler.backoff(attempt)
+                site.log(f"Search failed ({e}), retrying in {delay:.1f}s")
+                page.close()
+                time.sleep(delay)
+                attempt += 1
+
+    future = pool.submit(discover)
+    # Closed from the future's callback so the consumer is released even
+    # if the task never got to run
+    future.add_done_callback(lambda done: links.close())
+    return links, future
+
+
+# Main scraping function shared by every site
+def run_scrape(site, keyword, num_products, pool=None, job_id=None, use_cache=True, incremental=False,
+               index_max_age=None):
+    """Scrape ``num_products`` products for ``keyword`` and return the output file path.
+
+    The job and its products are recorded in the results store under
+    ``job_id`` (a new id is generated when none is given). With
+    ``use_cache`` a recent identical search is served from the cache and
+    product pages scraped recently by any search are not fetched again.
+    An ``incremental`` refresh always checks the live site but skips pages
+    the server reports as not modified, only emits new or changed products
+    (and only stores new snapshots of those) and reports a
+    new/changed/removed diff. With
+    ``index_max_age`` the search is answered from the product index when
+    it holds enough matching products scraped in the last
+    ``index_max_age`` seconds. Every live scrape adds its products to the
+    index as they are scraped.
+    """
+    if job_id is None:
+        job_id = uuid.uuid4().hex
+    profile = metrics.start_profile(job_id, site.name)
+    start = time.monotonic()
+    status = 'failed'
+    try:
+        with metrics.timer('db_write'):
+            results_store.start_job(job_id, site.name, keyword, num_products)
+        try:
+            output_filename, count = _scrape(site, keyword, num_products, pool, job_id, use_cache, incremental, index_max_age)
+        except Exception as e:
+            results_store.finish_job(job_id, 'failed', error=str(e))
+            raise
+        finally:
+            with metrics.timer('log_flush'):
+                db.flush_logs()
+        with metrics.timer('db_write'):
+            results_store.finish_job(job_id, 'finished', product_count=count, output_file=os.path.basename(output_filename))
+        status = 'finished'
+        return output_filename
+    finally:
+        metrics.job_seconds.observe(time.monotonic() - start, site=site.name)
+        metrics.jobs_total.inc(site=site.name, status=status)
+        progress.emit('profile', stages=profile.summary())
+        metrics.end_profile(profile)
+
+
+def _scrape(site, keyword, num_products, pool, job_id, use_cache, incremental, index_max_age=None):
+    site.log(f"Starting scraping process for {site.title} with keyword: {keyword}")
+    key = cache.search_key(site.name, keyword, num_products)
+    scraped = cache.search_cache.get(key) if use_cache and not incremental else None
+    source = 'search_cache'
+    if scraped is None and use_cache and not incremental and index_max_age is not None:
+        scraped = _from_index(site, keyword, num_products, index_max_age)
+        source = 'index'
+    diff = None
+
+    stream = export.ExportStream(site, keyword, num_products, job_id=job_id)
+    try:
+        if scraped is not None:
+            found = "cached products" if source == 'search_cache' else "products in the index"
+            site.log(f"Serving {len(scraped)} {found}.")
+            stream.open()
+            progress.emit('export', files=stream.files)
+            progress.emit('links_found', count=len(scraped), cached=True, source=source, message=f"Found {len(scraped)} {found}.")
+            for index, (product_link, product) in enumerate(scraped):
+                stream.write(product_link, product)
+                progress.emit('product', index=index + 1, total=len(scraped), url=product_link, row=product, cached=True)
+            metrics.products_total.inc(len(scraped), site=site.name, source=source)
+            changed = None
+        else:
+            scraped, changed, diff, complete = _scrape_live(site, keyword, num_products, pool, use_cache, incremental, stream)
+            # A search that lost pages would be served short (or empty) for
+            # the whole TTL; only complete results are cached
+            if complete and scraped:
+                cache.search_cache.set(key, scraped)
+
+        site.log(f"Scraped {len(scraped)} products. Saving results...")
+        with metrics.timer('db_write'):
+            results_store.save_products(job_id, site.name, scraped, name_field=site.name_field, changed=changed)
+            results_store.save_search_snapshot(job_id, site.name, keyword, num_products,
+                                               [product_link for product_link, _ in scraped], diff)
+
+        # The streamed files are complete; the Excel file is written in
+        # write-only mode from the rows in result order
+        with metrics.timer('export'):
+            output_filename = stream.finish(scraped)
+    except BaseException:
+        stream.abort()
+        raise
+    site.log(f"Data saved to: {', '.join(stream.files)}")
+    progress.emit('done', count=len(scraped), output_file=os.path.basename(output_filename), files=stream.files)
+
+    site.log("Scraping completed successfully.")
+    return output_filename, len(scraped)
+
+
+# Function to answer a search from the product index when it is fresh enough
+def _from_index(site, keyword, num_products, max_age):
+    try:
+        scraped = product_index.lookup(site, keyword, num_products, max_age)
+    except Exception as e:
+        site.log(f"Product index unavailable, searching the live site: {e}")
+        return None
+    if scraped is None:
+        site.log("Not enough fresh products in the index, searching the live site.")
+    return scraped
+
+
+def _scrape_live(site, keyword, num_products, pool, use_cache, incremental, stream):
+    """Scrape the live site, streaming each product to ``stream`` as it is scraped.
+
+    Returns every ``(url, product)`` found, the URLs that should get a new
+    snapshot in the results store (None for all of them), the diff of an
+    incremental run and whether every result was scraped (no page errors,
+    discovery finished).
+    """
+    if pool is None:
+        pool = browser_pool.get_pool()
+
+    network_stats = network_profile.NetworkStats()
+    links, discovery = discover_links(site, pool, keyword, num_products, network_stats)
+
+    product_links = []
+    positions = {}
+    products = {}
+    states = {}
+    page_validators = {}
+    not_modified_count = 0
+    page_errors = []
+    discovery_error = None
+    # Products go into the product index as they are scraped; the index
+    # catching up later is no reason to fail the scrape
+    indexer = product_index.IndexWriter(site, on_error=lambda e: site.log(f"Could not update the product index: {e}"))
+    # Products a crashed earlier run of this search already scraped. A
+    # refresh or an incremental run checks every page again instead
+    resumed = stream.resume() if use_cache and not incremental else {}
+    stream.open()
+    progress.emit('export', files=stream.files)
+
+    def emit_product(product_link, product, **flags):
+        progress.emit('product', index=positions[product_link] + 1, total=num_products, url=product_link, row=product, **flags)
+
+    def on_result(index, product_link, data, error):
+        if data:
+            product = data[0]
+            stream.write(product_link, product)
+            indexer.add(product_link, product)
+            state = states.get(product_link)
+            if state is None or state['fingerprint'] != fingerprint(product):
+                emit_product(product_link, product)
+        else:
+            page_errors.append(product_link)
+            metrics.page_errors_total.inc(site=site.name)
+            site.log(f"Error while scraping {product_link}: {error}")
+            progress.emit('error', url=product_link, message=f"Error while scraping product details: {error}")
+
+    fetcher = pipeline.Fetcher(
+        site,
+        lambda page, response: (scrape_product(site, page), validators(response)),
+        pool=pool,
+        on_result=on_result,
+        setup=lambda context: network_profile.apply(context, site, network_stats),
+        goto_options={'wait_until': site.wait_until},
+        use_http=http_fastpath.enabled(site),
+    )
+    try:
+        # Product pages are scraped while discovery is still reading results
+        for batch in links.batches():
+            for product_link in batch:
+                positions[product_link] = len(product_links)
+                product_links.append(product_link)
+            site.log(f"Found {len(product_links)} products so far.")
+            progress.emit('links_found', count=len(product_links), message=f"Found {len(product_links)} products.")
+
+            ready = {}
+            if incremental:
+                # Pages the server says are not modified keep their last snapshot
+                batch_states = results_store.load_fingerprints(site.name, batch)
+                states.update(batch_states)
+                with metrics.timer('conditional_check'):
+                    not_modified = check_not_modified(batch_states, scheduler=site.scheduler)
+                ready.update(results_store.latest_snapshots(site.name, not_modified))
+                not_modified_count += len(ready)
+                metrics.products_total.inc(len(ready), site=site.name, source='not_modified')
+            elif use_cache:
+                # Product pages scraped recently by any search are reused as they are
+                for product_link in batch:
+                    product = cache.product_cache.get(product_link)
+                    if product is not None:
+                        ready[product_link] = product
+                        emit_product(product_link, product, cached=True)
+                metrics.products_total.inc(len(ready), site=site.name, source='product_cache')
+
+            from_checkpoint = {product_link: resumed[product_link] for product_link in batch
+                               if product_link in resumed and product_link not in ready}
+            for product_link, product in from_checkpoint.items():
+                emit_product(product_link, product, resumed=True)
+            metrics.products_total.inc(len(from_checkpoint), site=site.name, source='checkpoint')
+            ready.update(from_checkpoint)
+
+            for product_link, product in ready.items():
+                stream.write(product_link, product)
+                indexer.add(product_link, product)
+            products.update(ready)
+            for product_link in batch:
+                if product_link not in ready:
+                    fetcher.put(product_link, positions[product_link])
+
+        try:
+            discovery.result()
+        except Exception as e:
+            if not product_links:
+                raise
+            discovery_error = e
+            site.log(f"Link discovery stopped early, continuing with {len(product_links)} products: {e}")
+        site.log(f"Found {len(product_links)} products.")
+        fetched = {}
+        for product_link, (product, product_validators) in fetcher.finish().items():
+            fetched[product_link], page_validators[product_link] = product, product_validators
+            cache.product_cache.set(product_link, product)
+    except BaseException:
+        links.cancel()
+        fetcher.cancel()
+        raise
+    finally:
+        indexer.flush()
+
+    if incremental:
+        site.log(f"{not_modified_count} products not modified since the last run.")
+    site.log(f"{fetcher.sources['http']} products extracted from HTML, {fetcher.sources['browser']} in the browser.")
+    metrics.products_total.inc(fetcher.sources['http'], site=site.name, source='http')
+    metrics.products_total.inc(fetcher.sources['browser'], site=site.name, source='browser')
+    network = network_stats.to_dict()
+    site.log(f"Network: {network['allowed_requests']} requests loaded, {sum(network['blocked_requests'].values())} blocked, "
+             f"about {network['estimated_bytes_saved'] // 1024} KB saved.")
+    progress.emit('network', **network)
+    products.update(fetched)
+
+    scraped = [(product_link, products[product_link]) for product_link in product_links if product_link in products]
+    changed = None
+    diff = None
+    if incremental:
+        previous_products = results_store.latest_snapshots(site.name, [url for url in fetched if url in states])
+        diff, fingerprints = build_diff(
+            results_store.last_search_urls(site.name, keyword, num_products), product_links, products, states, previous_products,
+        )
+        # Only new and changed products get a new snapshot
+        changed = set(diff['new']) | {change['url'] for change in diff['changed']}
+        message = (f"{len(diff['new'])} new, {len(diff['changed'])} changed, "
+                   f"{len(diff['unchanged'])} unchanged, {len(diff['removed'])} removed products.")
+        site.log(message)
+        progress.emit('diff', message=message, **diff)
+    else:
+        fingerprints = {product_link: fingerprint(product) for product_link, product in fetched.items()}
+
+    with metrics.timer('db_write'):
+        results_store.save_fingerprints(site.name, {
+            product_link: dict(page_validators[product_link], fingerprint=fingerprints[product_link])
+            for product_link in fetched
+        })
+    complete = not page_errors and discovery_error is None
+    return scraped, changed, diff, complete
@@ -0,0 +1,298 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import config
+import job_store
+from results_store import normalize_keyword
+
+# Streaming export of scraped products. Rows are appended to the output
+# files as each product is scraped, so a partial file can be downloaded
+# while the job runs and nothing is lost if it crashes. Every live scrape
+# also keeps a JSON lines checkpoint of the rows it has so far; running
+# the same search again after a crash resumes from the checkpoints left
+# behind instead of scraping those products again. Checkpoints are per
+# job, so concurrent scrapes of the same search don't share a file, and
+# only the checkpoints of jobs that are no longer queued or running (and
+# at most CHECKPOINT_MAX_AGE old) are resumed. The Excel file is written
+# at the end, in openpyxl's write-only mode, without building a
+# DataFrame. Once a job's files are written, the export files of old jobs
+# are removed (see STATIC_RETENTION_SECONDS and STATIC_MAX_BYTES).
+
+STREAMING_FORMATS = ('csv', 'jsonl', 'parquet')
+FORMATS = STREAMING_FORMATS + ('xlsx',)
+URL_COLUMN = 'product_url'
+
+# Export files of one job: scraped_products_<site>_<job id prefix>.<format>.
+# The combined file of a multi-site job (scraped_products_all_<id>.csv) is
+# written once by the job manager rather than streamed here, so eviction
+# leaves it alone and /jobs/<id>/results keeps working
+JOB_FILE = re.compile(r'^scraped_products_(?!all_).+_[0-9a-f]{12}\.\w+$')
+
+
+def checkpoint_path(site, keyword, num_products, job_id=None):
+    key = hashlib.sha1(normalize_keyword(keyword).encode('utf-8')).hexdigest()[:12]
+    suffix = f"-{job_id}" if job_id else ''
+    return os.path.join(config.CHECKPOINT_DIR, f"{site.name}-{key}-{int(num_products)}{suffix}.jsonl")
+
+
+# Checkpoints that a stream in this process is still writing
+_open_checkpoints = set()
+_open_lock = threading.Lock()
+
+
+def load_checkpoint(path):
+    """Return ``{url: product}`` from a checkpoint file, skipping a torn last line."""
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            rows[entry['url']] = entry['row']
+    return rows
+
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+        self._writer.writeheader()
+        self._file.flush()
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row):
+        self._file.write(json.dumps(row, default=str) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    # Parquet can't be appended row by row; rows are written as row groups
+    batch_size = 50
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow to be installed")
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append({column: None if row.get(column) is None else str(row.get(column))
+                           for column in self._schema.names})
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+_WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonlWriter, 'parquet': _ParquetWriter}
+
+
+def write_file(path, fmt, columns, rows):
+    """Write ``rows`` (dicts) to ``path`` in one of FORMATS, or as a single JSON array."""
+    if fmt == 'xlsx':
+        write_xlsx(path, columns, rows)
+    elif fmt == 'json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{column: row.get(column) for column in columns} for row in rows], f, default=str)
+    else:
+        writer = _WRITERS[fmt](path, columns)
+        try:
+            for row in rows:
+                writer.write(row)
+        finally:
+            writer.close()
+
+
+def write_xlsx(path, columns, rows):
+    """Write ``rows`` (dicts) to an Excel file without holding the workbook in memory."""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([_cell(row.get(column)) for column in columns])
+    workbook.save(path)
+
+
+def _cell(value):
+    # openpyxl only takes scalar cell values
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def evict(keep=(), max_age=None, limit=None):
+    """Remove job export files older than ``max_age`` seconds, then the oldest beyond ``limit`` bytes.
+
+    Files named in ``keep`` are left alone. Returns the number removed.
+    """
+    max_age = config.STATIC_RETENTION_SECONDS if max_age is None else max_age
+    limit = config.STATIC_MAX_BYTES if limit is None else limit
+    if not os.path.isdir(config.STATIC_DIR):
+        return 0
+    entries = []
+    total = 0
+    for entry in os.scandir(config.STATIC_DIR):
+        if entry.is_file() and JOB_FILE.match(entry.name):
+            stat = entry.stat()
+            total += stat.st_size
+            if entry.name not in keep:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    cutoff = time.time() - max_age if max_age else None
+    removed = 0
+    for modified, size, path in sorted(entries):
+        expired = cutoff is not None and modified < cutoff
+        if not expired and (not limit or total <= limit):
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ExportStream:
+    """Streams one scrape's products to its checkpoint and export files."""
+
+    def __init__(self, site, keyword, num_products, formats=None, job_id=None):
+        self.site = site
+        self.job_id = job_id
+        self.formats = [fmt for fmt in (formats or config.EXPORT_FORMATS) if fmt in FORMATS] or ['xlsx']
+        self.columns = list(site.product_fields)
+        self.checkpoint = checkpoint_path(site, keyword, num_products, job_id)
+        self._search_checkpoint = checkpoint_path(site, keyword, num_products)
+        self._resumed_from = []
+        self.count = 0
+        self._writers = {}
+        self._checkpoint_file = None
+        self._lock = threading.Lock()
+
+    @property
+    def files(self):
+        return [self.site.output_filename(fmt, self.job_id) for fmt in self.formats]
+
+    def resume(self):
+        """Rows saved by earlier runs of the same search that did not finish."""
+        rows = {}
+        prefix = self._search_checkpoint[:-len('.jsonl')] + '-'
+        with _open_lock:
+            candidates = glob.glob(prefix + '*.jsonl') + glob.glob(self._search_checkpoint)
+            paths = [path for path in candidates if path not in _open_checkpoints]
+        # A job in another process (or on another host) may still be
+        # writing its checkpoint
+        job_ids = {path: path[len(prefix):-len('.jsonl')] for path in paths if path.startswith(prefix)}
+        try:
+            active = job_store.get_store().active(set(job_ids.values()))
+        except Exception as e:
+            print(f"Could not check the jobs of the checkpoints, not resuming them: {e}")
+            active = set(job_ids.values())
+        paths = [path for path in paths if job_ids.get(path) not in active]
+        # Rows from long ago are no better than an unscraped page
+        cutoff = time.time() - config.CHECKPOINT_MAX_AGE
+        fresh = []
+        for path in paths:
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    fresh.append(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                continue  # removed by another run
+        for path in sorted(fresh, key=os.path.getmtime):
+            rows.update(load_checkpoint(path))
+        self._resumed_from = fresh
+        return rows
+
+    def open(self, resumed=None):
+        """Start the export files, carrying over ``resumed`` rows from the checkpoint.
+
+        The checkpoints resumed from are removed once this stream finishes.
+        """
+        os.makedirs(config.CHECKPOINT_DIR, exist_ok=True)
+        columns = [URL_COLUMN] + self.columns
+        for fmt in self.formats:
+            if fmt in STREAMING_FORMATS:
+                self._writers[fmt] = _WRITERS[fmt](os.path.join(config.STATIC_DIR, self.site.output_filename(fmt, self.job_id)), columns)
+        with _open_lock:
+            _open_checkpoints.add(self.checkpoint)
+        self._checkpoint_file = open(self.checkpoint, 'w', encoding='utf-8')
+        for url, product in (resumed or {}).items():
+            self.write(url, product)
+
+    def write(self, url, product):
+        with self._lock:
+            if self._checkpoint_file is None:
+                return  # finished or aborted
+            self._checkpoint_file.write(json.dumps({'url': url, 'row': product}, default=str) + '\n')
+            self._checkpoint_file.flush()
+            row = dict(product, **{URL_COLUMN: url})
+            for writer in self._writers.values():
+                writer.write(row)
+            self.count += 1
+
+    def finish(self, scraped):
+        """Close the streams, write the Excel file from ``scraped`` and drop the checkpoint.
+
+        Returns the path of the first configured export file.
+        """
+        self._close()
+        if 'xlsx' in self.formats:
+            write_xlsx(os.path.join(config.STATIC_DIR, self.site.output_filename('xlsx', self.job_id)),
+                       self.columns, (product for _, product in scraped))
+        for path in [self.checkpoint] + self._resumed_from:
+            if os.path.exists(path):
+                os.remove(path)
+        evict(keep=self.files)
+        return os.path.join(config.STATIC_DIR, self.files[0])
+
+    def abort(self):
+        # Keep the checkpoint so the next run of this search can resume
+        self._close()
+
+    def _close(self):
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = {}
+            if self._checkpoint_file is not None:
+                self._checkpoint_file.close()
+                self._checkpoint_file = None
+        with _open_lock:
+            _open_checkpoints.discard(self.checkpoint)
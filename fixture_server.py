@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, quote, urlparse
+
+import config
+
+# Offline stand-in for the retail sites. It serves search and product pages
+# shaped like the live ones (same ids, classes and client-side rendering
+# where the live site has it) under /<site>/, so every scraper can run
+# against it without touching the real retailers:
+#
+#     python fixture_server.py --port 8700 --latency 0.05
+#
+# and point a site at http://127.0.0.1:8700/<site>/. Pages are built from
+# the templates in fixtures/<site>/ for a fixed catalogue of products.
+
+FIXTURES_DIR = os.path.join(config.BASE_DIR, 'fixtures')
+SITES = ('uniformadvantage', 'wearfigs', 'scrubharvard')
+PAGE_SIZE = 12  # results per search page (or per infinite-scroll / load-more batch)
+
+STYLES = ['Catarina One-Pocket Scrub Top', 'Zamora Jogger Scrub Pants', 'Leon Three-Pocket Scrub Top',
+          'Kade Cargo Scrub Pants', 'Rafaela Oversized Scrub Top', 'Casma Three-Pocket Scrub Top',
+          'Livingston Basic Scrub Pants', 'Mandarin Collar Lab Coat']
+COLORS = ['Navy', 'Black', 'Ceil Blue', 'Charcoal', 'Wine', 'Hunter Green']
+SIZES = ['XXS', 'XS', 'S', 'M', 'L', 'XL', '2XL']
+FABRICS = ['72% polyester, 21% rayon, 7% spandex', '77% polyester, 23% spandex', '65% polyester, 35% cotton']
+
+# 1x1 transparent PNG for the image placeholders
+PLACEHOLDER_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+
+
+def product(number):
+    """The catalogue entry for product ``number`` (the same on every site)."""
+    price = 20 + number % 30
+    return {
+        'number': number,
+        'name': f"{STYLES[number % len(STYLES)]} {number}",
+        'style': f"FX{number:05d}",
+        'price': f"${price}.99",
+        'original_price': f"${price + 10}.99",
+        'discount': 'Save 25%' if number % 3 == 0 else 'No Discount',
+        'rating': f"{3.5 + (number % 4) * 0.5:.1f}",
+        'reviews': str(5 + number * 7 % 400),
+        'colors': COLORS[:2 + number % 4],
+        'sizes': SIZES[number % 2:],
+        'fabric': FABRICS[number % len(FABRICS)],
+        'features': ['Four-way stretch', f"{1 + number % 4} pockets", 'Anti-wrinkle'],
+    }
+
+
+class _Templates:
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def render(self, site, page, values=None):
+        with self._lock:
+            template = self._cache.get((site, page))
+            if template is None:
+                with open(os.path.join(FIXTURES_DIR, site, f"{page}.html"), encoding='utf-8') as f:
+                    template = self._cache[(site, page)] = Template(f.read())
+        return template.safe_substitute(values or {})
+
+
+class FixtureServer:
+    """Serves the fixture sites on a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, products=60, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        # Fraction of product page requests answered with a 503, to exercise retries
+        self.error_rate = error_rate
+        self.products = products
+        self.templates = _Templates()
+        self.requests = 0
+        # Product page path -> monotonic time it was first requested
+        self.first_requested = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, site_name):
+        return f"{self.base_url}/{site_name}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._serve(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _serve(self, request):
+        url = urlparse(request.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self._lock:
+            self.requests += 1
+            if len(parts) == 3 and parts[1] == 'products':
+                self.first_requested.setdefault(url.path, time.monotonic())
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if parts == ['static', 'placeholder.png']:
+            return self._send(request, 200, PLACEHOLDER_PNG, 'image/png')
+        if not parts or parts[0] not in SITES:
+            return self._send(request, 404, b'Not found', 'text/plain')
+
+        site, route = parts[0], parts[1:]
+        if not route:
+            body = self.templates.render(site, 'home')
+        elif route == ['search']:
+            body = self._search_page(site, query.get('q') or query.get('searchText') or '', int(query.get('page', '1')))
+        elif route == ['search', 'more']:
+            body = self._more(site, query.get('q') or query.get('searchText') or '', int(query.get('page', '2')))
+        elif len(route) == 2 and route[0] == 'products' and route[1].isdigit() and 1 <= int(route[1]) <= self.products:
+            if random.random() < self.error_rate:
+                return self._send(request, 503, b'Service unavailable', 'text/plain')
+            body = self._product_page(site, int(route[1]))
+        else:
+            return self._send(request, 404, b'Not found', 'text/plain')
+        self._send(request, 200, body.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _send(self, request, status, body, content_type):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    @property
+    def pages(self):
+        return -(-self.products // PAGE_SIZE)
+
+    def _items(self, site, page):
+        numbers = range(1, self.products + 1)[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        return ''.join(self.templates.render(site, 'item', product(number)) for number in numbers)
+
+    def _more_button(self, keyword, page):
+        # Uniform Advantage: the next batch is appended by the "More Results" button
+        if page > self.pages:
+            return ''
+        url = f"search/more?q={quote(keyword)}&amp;page={page}"
+        return f'<div class="show-more"><button class="more" data-url="{url}">More Results</button></div>'
+
+    def _more(self, site, keyword, page):
+        items = self._items(site, page)
+        if site == 'uniformadvantage':
+            items += self._more_button(keyword, page + 1)
+        return items
+
+    def _search_page(self, site, keyword, page=1):
+        values = {
+            'keyword': keyword,
+            'total': self.products,
+            'pages': self.pages,
+            'items': self._items(site, page),
+            'more': self._more_button(keyword, page + 1),
+            'pagination': '',
+        }
+        # Scrub Harvard: Shopify-style numbered result pages
+        if site == 'scrubharvard' and page < self.pages:
+            values['pagination'] = (f'<div class="pagination"><span class="next">'
+                                    f'<a href="search?q={quote(keyword)}&amp;page={page + 1}" title="Next">Next &raquo;</a>'
+                                    f'</span></div>')
+        return self.templates.render(site, 'search', values)
+
+    def _product_page(self, site, number):
+        item = product(number)
+        values = dict(item)
+        values['color_swatches'] = ''.join(f'<button class="swatch" title="{color}"></button>' for color in item['colors'])
+        values['size_buttons'] = ''.join(f'<button class="size">{size}</button>' for size in item['sizes'])
+        values['feature_items'] = ''.join(f'<li>{feature}</li>' for feature in item['features'])
+        if site == 'scrubharvard':
+            values['product_json'] = json.dumps({
+                'title': item['name'],
+                'options': ['Color', 'Size'],
+                'variants': [{'option1': color, 'option2': size} for color in item['colors'] for size in item['sizes']],
+            })
+        else:
+            values['product_json'] = json.dumps(item)
+        return self.templates.render(site, 'product', values)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the offline fixture sites.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra random seconds")
+    parser.add_argument('--products', type=int, default=60, help="products in each site's catalogue")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of product pages answered with a 503")
+    args = parser.parse_args()
+
+    fixture_server = FixtureServer(args.host, args.port, args.latency, args.jitter, args.products, args.error_rate)
+    print(f"Serving {', '.join(SITES)} on {fixture_server.base_url}/<site>/")
+    try:
+        fixture_server.serve_forever()
+    except KeyboardInterrupt:
+        fixture_server.stop()
@@ -0,0 +1,183 @@
+import json
+import re
+import threading
+
+import config
+import metrics
+from incremental import USER_AGENT
+from scheduler import check_status
+
+# HTTP-first product extraction. Much of what a product page shows is
+# already in the server-rendered HTML (or in JSON embedded in it), so each
+# product URL is first fetched with a plain pooled HTTP client and the
+# site's field spec is evaluated against the parsed HTML. Only the pages
+# where a field the site requires comes back empty are loaded in a browser.
+#
+# requests and lxml (with cssselect) are optional and only imported the
+# first time the fast path runs: without them it is switched off and every
+# product page goes through the browser.
+
+requests = None
+HTTPAdapter = None
+lxml_html = None
+CSSSelector = None
+_available = None
+
+
+def available():
+    global requests, HTTPAdapter, lxml_html, CSSSelector, _available
+    if _available is None:
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from lxml import html as lxml_html
+            from lxml.cssselect import CSSSelector
+            _available = True
+        except ImportError:
+            _available = False
+    return _available
+
+
+_BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'details', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li',
+    'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table', 'tr', 'ul',
+}
+_HIDDEN_TAGS = {'script', 'style', 'noscript', 'template', 'head'}
+_WHITESPACE = re.compile(r'\s+')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_selectors = {}
+
+
+def _session(site):
+    # One keep-alive session per site, sized for the page concurrency
+    with _sessions_lock:
+        session = _sessions.get(site.name)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.PAGE_CONCURRENCY)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[site.name] = session
+        return session
+
+
+def _select(root, selector):
+    compiled = _selectors.get(selector)
+    if compiled is None:
+        compiled = _selectors[selector] = CSSSelector(selector)
+    return compiled(root)
+
+
+def _inner_text(element):
+    """Approximate the browser's innerText: hidden tags skipped, block elements on their own lines."""
+    parts = []
+
+    def add(text):
+        # Source whitespace, newlines included, collapses to one space
+        if text:
+            parts.append(_WHITESPACE.sub(' ', text))
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in _HIDDEN_TAGS:
+            # comments and processing instructions still have tail text
+            if node is not element:
+                add(node.tail)
+            return
+        block = node.tag in _BLOCK_TAGS
+        if block:
+            parts.append('\n')
+        add(node.text)
+        for child in node:
+            walk(child)
+        if block:
+            parts.append('\n')
+        if node is not element:
+            add(node.tail)
+
+    walk(element)
+    lines = (line.strip() for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def _read(element, field):
+    value = element.get(field['attribute']) if field.get('attribute') else _inner_text(element)
+    return '' if value is None else value.strip()
+
+
+def extract_html(document, fields):
+    """Evaluate a field spec (see extraction.py) against a parsed HTML document."""
+    result = {}
+    for name, field in fields.items():
+        value = None
+        matches = _select(document, field['selector'])
+        if field.get('all'):
+            values = [text for text in (_read(element, field) for element in matches) if text != '']
+            if values:
+                value = field.get('join', ', ').join(values)
+        elif matches:
+            value = _read(matches[0], field)
+        result[name] = field.get('default') if value is None else value
+    return result
+
+
+def missing_fields(site, product):
+    """The fields ``site`` needs that the HTML did not provide."""
+    missing = []
+    for name in site.http_required():
+        field = site.product_fields.get(name, {})
+        value = product.get(name)
+        if not value or ('default' in field and value == field['default']):
+            missing.append(name)
+    return missing
+
+
+# Function to fetch and extract one product page without a browser
+def fetch_product(site, url):
+    """Return ``(product, validators)`` for ``url``, or None if the browser is needed."""
+    with metrics.timer('http_fetch', url=url):
+        response = _session(site).get(url, timeout=config.HTTP_TIMEOUT)
+    check_status(response.status_code, response.headers)
+    if 'html' not in response.headers.get('content-type', 'text/html'):
+        return None
+
+    with metrics.timer('http_extract', url=url):
+        document = lxml_html.fromstring(response.content, base_url=response.url)
+        product = site.http_extract(document, extract_html(document, site.product_fields))
+    if missing_fields(site, product):
+        return None
+
+    page_validators = {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+    }
+    return site.post_process(product), page_validators
+
+
+def enabled(site):
+    return config.HTTP_FAST_PATH and site.http_fast_path and available()
+
+
+def fetch_one(site, url):
+    """``(product, validators)`` for ``url`` over plain HTTP, or None if it has to be loaded in a browser."""
+    if not available():
+        return None
+    try:
+        # No retries here: a page that fails over HTTP is retried in the browser
+        return site.scheduler.call(lambda: fetch_product(site, url), retries=0)
+    except Exception as e:
+        site.log(f"HTTP fetch of {url} failed, falling back to the browser: {e}")
+        return None
+
+
+def embedded_json(document, selector):
+    """Parse the JSON in the first script matching ``selector``, or None."""
+    for script in _select(document, selector):
+        try:
+            return json.loads(script.text or '')
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from scheduler import check_status
+
+# Helpers for incremental refreshes: a product page whose server says it
+# has not been modified since our last visit is not loaded again, and a
+# product whose extracted fields hash to the same fingerprint as last time
+# is reported as unchanged instead of being re-emitted and re-stored.
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+
+def fingerprint(product):
+    """Stable hash of every extracted field of a product."""
+    return hashlib.sha1(json.dumps(product, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def changed_fields(old, new):
+    return sorted(field for field in set(old) | set(new) if old.get(field) != new.get(field))
+
+
+def validators(response):
+    """The HTTP validators of a product page response, for later conditional checks."""
+    if response is None:
+        return {}
+    headers = response.headers
+    return {'etag': headers.get('etag'), 'last_modified': headers.get('last-modified')}
+
+
+def is_not_modified(url, state, timeout=10):
+    """Ask the server with a conditional GET whether ``url`` changed since ``state`` was stored.
+
+    Server errors and network failures are raised (as for any request
+    made through a DomainScheduler) so the domain's scheduler sees them.
+    """
+    headers = {'User-Agent': USER_AGENT}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    if len(headers) == 1:
+        return False
+
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout):
+            return False
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return True
+        check_status(e.code, e.headers)
+        return False
+
+
+def check_not_modified(states, scheduler=None, concurrency=config.PAGE_CONCURRENCY):
+    """Return the URLs in ``states`` the server reports as not modified."""
+    candidates = [url for url, state in states.items() if state.get('etag') or state.get('last_modified')]
+    if not candidates:
+        return set()
+
+    def check(url):
+        try:
+            if scheduler is None:
+                return url, is_not_modified(url, states[url])
+            # No retries: a page whose check fails is simply scraped again
+            return url, scheduler.call(lambda: is_not_modified(url, states[url]), retries=0)
+        except Exception:
+            return url, False
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return {url for url, not_modified in executor.map(check, candidates) if not_modified}
+
+
+def build_diff(previous_urls, product_links, products, states, previous_products):
+    """Compare this run with the previous one.
+
+    Returns the diff with ``new``, ``changed`` (with the fields that
+    changed), ``unchanged`` and ``removed`` product URLs, together with the
+    fingerprint of every product scraped in this run.
+    """
+    diff = {'new': [], 'changed': [], 'unchanged': [], 'removed': []}
+    fingerprints = {}
+    for url in product_links:
+        product = products.get(url)
+        if product is None:
+            continue
+        fingerprints[url] = fingerprint(product)
+        state = states.get(url)
+        if state is None:
+            diff['new'].append(url)
+        elif state['fingerprint'] == fingerprints[url]:
+            diff['unchanged'].append(url)
+        else:
+            fields = changed_fields(previous_products.get(url, {}), product)
+            diff['changed'].append({'url': url, 'fields': fields})
+
+    current = set(product_links)
+    diff['removed'] = [url for url in (previous_urls or []) if url not in current]
+    return diff, fingerprints
@@ -0,0 +1,350 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+import db
+
+# Shared state of scrape jobs. Job rows, their progress events and the
+# queue of jobs waiting for a worker live in a store every process can
+# reach, so any web worker can accept a scrape, report its status or
+# stream its events while a worker thread in any process (or on another
+# host) runs it.
+#
+# The default store is a local SQLite file in WAL mode, which processes on
+# one host (e.g. several gunicorn workers next to `python worker.py`)
+# share safely. SCRAPER_JOB_STORE=database keeps the jobs in the results
+# database instead, so workers on other hosts can use a MySQL server.
+# Further stores can be registered in STORES.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS job_state (
+        job_id VARCHAR(32) PRIMARY KEY,
+        parent_id VARCHAR(32),
+        search_key VARCHAR(512),
+        site VARCHAR(64) NOT NULL,
+        use_cache INT NOT NULL DEFAULT 1,
+        status VARCHAR(16) NOT NULL,
+        subscribers INT NOT NULL DEFAULT 1,
+        worker VARCHAR(128),
+        created_at DOUBLE NOT NULL,
+        heartbeat_at DOUBLE,
+        state TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS job_events (
+        event_id {id},
+        job_id VARCHAR(32) NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    # A single row that exclusive transactions lock, so that every process
+    # on every host submits and claims jobs one at a time
+    """CREATE TABLE IF NOT EXISTS job_locks (
+        name VARCHAR(32) PRIMARY KEY,
+        locked_at DOUBLE NOT NULL
+    )""",
+]
+
+INDEXES = [
+    ('idx_job_state_queue', 'job_state', 'status, created_at'),
+    ('idx_job_state_search', 'job_state', 'search_key, status'),
+    ('idx_job_state_parent', 'job_state', 'parent_id'),
+    ('idx_job_events_job', 'job_events', 'job_id, event_id'),
+]
+
+
+def _key(search_key):
+    return json.dumps(list(search_key)) if search_key is not None else None
+
+
+class JobStore:
+    """Job rows and events in a SQL database, shared by every process that opens it.
+
+    Subclasses provide ``_connection()`` and the SQL dialect. Waiting
+    readers in this process are woken as soon as an event is added here;
+    events written by other processes are picked up by polling.
+    """
+
+    placeholder = '%s'
+    id_column = "INT AUTO_INCREMENT PRIMARY KEY"
+    insert_ignore = "INSERT IGNORE"
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        raise NotImplementedError
+
+    def _begin(self, cursor, exclusive):
+        # Updating the lock row holds it until commit, so exclusive
+        # transactions from any host run one after the other
+        if exclusive:
+            self._execute(cursor, "UPDATE job_locks SET locked_at = %s WHERE name = %s", (time.time(), 'queue'))
+
+    def init_schema(self):
+        with self._ready_lock:
+            if self._ready:
+                return
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                for statement in TABLES:
+                    cursor.execute(statement.format(id=self.id_column))
+                for name, table, columns in INDEXES:
+                    # The SQLite stores use ? placeholders
+                    db.create_index(cursor, name, table, columns, sqlite=self.placeholder == '?')
+                self._execute(cursor, f"{self.insert_ignore} INTO job_locks (name, locked_at) VALUES (%s, %s)", ('queue', 0))
+                conn.commit()
+                cursor.close()
+            self._ready = True
+
+    @contextmanager
+    def _transaction(self, exclusive=False):
+        """A cursor whose statements are committed together (``exclusive`` also locks out other writers)."""
+        self.init_schema()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(cursor, exclusive)
+                yield cursor
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _execute(self, cursor, query, params=()):
+        cursor.execute(query.replace('%s', self.placeholder), params)
+
+    def _rows(self, cursor, query, params=()):
+        self._execute(cursor, query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _job(row):
+        job = json.loads(row['state'])
+        job['status'] = row['status']
+        job['subscribers'] = row['subscribers']
+        job['worker'] = row['worker']
+        return job
+
+    def _insert(self, cursor, job, search_key=None):
+        self._execute(
+            cursor,
+            "INSERT INTO job_state (job_id, parent_id, search_key, site, use_cache, status, subscribers, created_at, state) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (job['job_id'], job.get('parent_id'), _key(search_key), job['site'], int(job.get('use_cache', True)),
+             job['status'], job.get('subscribers', 1), job['created_at'], json.dumps(job, default=str)),
+        )
+
+    def create(self, jobs):
+        """Queue ``jobs`` (job dicts, parents before their children) in one transaction."""
+        with self._transaction() as cursor:
+            for job in jobs:
+                self._insert(cursor, job)
+        self._notify()
+
+    def submit(self, job, search_key, use_cache=True):
+        """Queue ``job``, or attach to the queued or running job with the same ``search_key``.
+
+        Returns the job that will do the work. A ``use_cache=False``
+        refresh only attaches to a job that doesn't serve cached results
+        either.
+        """
+        query = "SELECT * FROM job_state WHERE search_key = %s AND status IN (%s, %s)"
+        if not use_cache:
+            query += " AND use_cache = 0"
+        with self._transaction(exclusive=True) as cursor:
+            for row in self._rows(cursor, query + " ORDER BY created_at", (_key(search_key), QUEUED, RUNNING)):
+                self._execute(cursor, "UPDATE job_state SET subscribers = subscribers + 1 WHERE job_id = %s AND status IN (%s, %s)",
+                              (row['job_id'], QUEUED, RUNNING))
+                if cursor.rowcount == 1:
+                    row['subscribers'] += 1
+                    return self._job(row)
+            self._insert(cursor, job, search_key)
+        self._notify()
+        return job
+
+    def claim(self, worker):
+        """Mark the oldest queued top-level job as running on ``worker`` and return it, or None."""
+        while True:
+            with self._transaction(exclusive=True) as cursor:
+                rows = self._rows(cursor, "SELECT * FROM job_state WHERE status = %s AND parent_id IS NULL "
+                                          "ORDER BY created_at LIMIT 1", (QUEUED,))
+                if not rows:
+                    return None
+                row = rows[0]
+                # Another worker may take the job between the select and the
+                # update; only the one whose update matched owns it
+                self._execute(cursor, "UPDATE job_state SET status = %s, worker = %s, heartbeat_at = %s "
+                                      "WHERE job_id = %s AND status = %s",
+                              (RUNNING, worker, time.time(), row['job_id'], QUEUED))
+                if cursor.rowcount == 1:
+                    row.update(status=RUNNING, worker=worker)
+                    return self._job(row)
+
+    def save(self, job):
+        """Store the current state of a running job (also its heartbeat)."""
+        with self._transaction() as cursor:
+            self._execute(cursor, "UPDATE job_state SET status = %s, state = %s, heartbeat_at = %s WHERE job_id = %s",
+                          (job['status'], json.dumps(job, default=str), time.time(), job['job_id']))
+        self._notify()
+
+    def add_event(self, job_id, event):
+        with self._transaction() as cursor:
+            self._execute(cursor, "INSERT INTO job_events (job_id, data) VALUES (%s, %s)",
+                          (job_id, json.dumps(event, default=str)))
+        self._notify()
+
+    def events(self, job_id, after=0):
+        """``(event_id, event)`` pairs of ``job_id`` with an id above ``after``, oldest first."""
+        with self._transaction() as cursor:
+            rows = self._rows(cursor, "SELECT event_id, data FROM job_events WHERE job_id = %s AND event_id > %s "
+                                      "ORDER BY event_id", (job_id, after))
+        return [(row['event_id'], json.loads(row['data'])) for row in rows]
+
+    def get(self, job_id):
+        with self._transaction() as cursor:
+            rows = self._rows(cursor, "SELECT * FROM job_state WHERE job_id = %s", (job_id,))
+        return self._job(rows[0]) if rows else None
+
+    def children(self, parent_id):
+        with self._transaction() as cursor:
+            rows = self._rows(cursor, "SELECT * FROM job_state WHERE parent_id = %s ORDER BY created_at", (parent_id,))
+        return [self._job(row) for row in rows]
+
+    def active(self, job_ids):
+        """The ids among ``job_ids`` of jobs that are queued or running."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        placeholders = ', '.join(['%s'] * len(job_ids))
+        with self._transaction() as cursor:
+            rows = self._rows(cursor, f"SELECT job_id FROM job_state WHERE job_id IN ({placeholders}) AND status IN (%s, %s)",
+                              job_ids + [QUEUED, RUNNING])
+        return {row['job_id'] for row in rows}
+
+    def list(self, limit=100):
+        with self._transaction() as cursor:
+            rows = self._rows(cursor, "SELECT * FROM job_state ORDER BY created_at DESC LIMIT %s", (int(limit),))
+        return [self._job(row) for row in rows]
+
+    def count(self, status=None):
+        query, params = "SELECT COUNT(*) AS n FROM job_state", ()
+        if status is not None:
+            query, params = query + " WHERE status = %s", (status,)
+        with self._transaction() as cursor:
+            return self._rows(cursor, query, params)[0]['n']
+
+    def fail_stale(self, max_age):
+        """Fail running jobs whose worker hasn't reported for ``max_age`` seconds; returns their ids."""
+        error = "The worker running this job stopped responding"
+        with self._transaction(exclusive=True) as cursor:
+            rows = self._rows(cursor, "SELECT * FROM job_state WHERE status = %s AND heartbeat_at < %s",
+                              (RUNNING, time.time() - max_age))
+            for row in rows:
+                job = self._job(row)
+                job.update(status=FAILED, error=error, finished_at=time.time())
+                self._execute(cursor, "UPDATE job_state SET status = %s, state = %s WHERE job_id = %s AND status = %s",
+                              (FAILED, json.dumps(job, default=str), row['job_id'], RUNNING))
+                self._execute(cursor, "INSERT INTO job_events (job_id, data) VALUES (%s, %s)",
+                              (row['job_id'], json.dumps({'event': 'error', 'message': error})))
+        if rows:
+            self._notify()
+        return [row['job_id'] for row in rows]
+
+    def prune(self, max_age):
+        """Delete finished and failed jobs last updated over ``max_age`` seconds ago, with their events.
+
+        Returns the number of jobs deleted.
+        """
+        ended = "status IN (%s, %s) AND COALESCE(heartbeat_at, created_at) < %s"
+        params = (FINISHED, FAILED, time.time() - max_age)
+        with self._transaction() as cursor:
+            self._execute(cursor, f"DELETE FROM job_events WHERE job_id IN (SELECT job_id FROM job_state WHERE {ended})", params)
+            self._execute(cursor, f"DELETE FROM job_state WHERE {ended}", params)
+            return cursor.rowcount
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait(self, timeout):
+        """Sleep until something changes in this process or ``timeout`` seconds pass."""
+        with self._changed:
+            self._changed.wait(timeout)
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs in a local SQLite file, shared by every process on the host."""
+
+    placeholder = '?'
+    id_column = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    insert_ignore = "INSERT OR IGNORE"
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or config.JOB_STORE_PATH
+        self._local = threading.local()
+
+    @contextmanager
+    def _connection(self):
+        # One connection per thread; SQLite serializes writers across processes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        yield conn
+
+    def _begin(self, cursor, exclusive):
+        cursor.execute("BEGIN IMMEDIATE" if exclusive else "BEGIN")
+
+
+class DatabaseJobStore(JobStore):
+    """Jobs in the results database (config.DB_BACKEND), reachable from other hosts with MySQL."""
+
+    def __init__(self):
+        super().__init__()
+        if config.DB_BACKEND == 'sqlite':
+            self.placeholder = '?'
+            self.id_column = "INTEGER PRIMARY KEY AUTOINCREMENT"
+            self.insert_ignore = "INSERT OR IGNORE"
+
+    @contextmanager
+    def _connection(self):
+        with db.get_pool().connection() as conn:
+            yield conn
+
+
+STORES = {
+    'sqlite': SQLiteJobStore,
+    'database': DatabaseJobStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The job store selected by SCRAPER_JOB_STORE, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if config.JOB_STORE not in STORES:
+                raise ValueError(f"Unknown job store: {config.JOB_STORE}")
+            _store = STORES[config.JOB_STORE]()
+        return _store
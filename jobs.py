@@ -0,0 +1,444 @@
+import csv
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+import cache
+import job_store
+import progress
+from engine import run_scrape
+from job_store import QUEUED, RUNNING, FINISHED, FAILED
+from normalize import COLUMNS, normalize
+from sites import all_sites, get_site
+
+SAVE_INTERVAL = 0.5
+PRUNE_INTERVAL = 3600  # seconds between sweeps of old jobs out of the store
+
+
+class Job:
+    """A single scrape request and everything we know about its progress.
+
+    The job object lives in the process running the scrape. Its events
+    and state are written to the shared job store as they change (state
+    at most every SAVE_INTERVAL seconds while running), which is where
+    every other process reads them from.
+    """
+
+    def __init__(self, site, keyword, num_products, use_cache=True, incremental=False, parent=None,
+                 job_id=None, store=None, index_max_age=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.parent = parent
+        self.store = store
+        self.site = site
+        self.keyword = keyword
+        self.num_products = num_products
+        self.use_cache = use_cache
+        self.incremental = incremental
+        # Answer from the product index if it has matches at most this many seconds old
+        self.index_max_age = index_max_age
+        self.diff = None
+        self.profile = None
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.last_message = None
+        self.output_file = None
+        self.error = None
+        self.total = None
+        self.done = 0
+        self._lock = threading.Lock()
+        # Saves go out one at a time so an older state never overwrites a newer one
+        self._save_lock = threading.Lock()
+        self._saved_at = 0
+
+    @classmethod
+    def from_dict(cls, data, parent=None, store=None):
+        """Rebuild a queued job from its stored state."""
+        job = cls(data['site'], data['keyword'], data['num_products'], use_cache=data.get('use_cache', True),
+                  incremental=data.get('incremental', False), parent=parent, job_id=data['job_id'], store=store,
+                  index_max_age=data.get('index_max_age'))
+        job.created_at = data['created_at']
+        return job
+
+    @property
+    def is_done(self):
+        return self.status in (FINISHED, FAILED)
+
+    def set_status(self, status):
+        with self._lock:
+            self.status = status
+        self.save()
+
+    def save(self, force=True):
+        """Write the job's state to the store (unless saved less than SAVE_INTERVAL ago and not ``force``)."""
+        if self.store is None:
+            return
+        with self._save_lock:
+            now = time.monotonic()
+            if not force and now - self._saved_at < SAVE_INTERVAL:
+                return
+            self._saved_at = now
+            self.store.save(self.to_dict())
+
+    def add_event(self, event):
+        """Record a progress event reported by the scraper."""
+        with self._lock:
+            if event['event'] == 'links_found':
+                self.total = event.get('count')
+            elif event['event'] == 'product':
+                self.done += 1
+            elif event['event'] == 'diff':
+                self.diff = {key: event[key] for key in ('new', 'changed', 'unchanged', 'removed')}
+            elif event['event'] == 'profile':
+                self.profile = event['stages']
+            if event.get('message'):
+                self.last_message = event['message']
+        if self.store is not None:
+            self.store.add_event(self.id, event)
+            self.save(force=False)
+        if self.parent is not None:
+            self.parent.child_event(self, event)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'parent_id': self.parent.id if self.parent is not None else None,
+            'site': self.site,
+            'keyword': self.keyword,
+            'num_products': self.num_products,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'use_cache': self.use_cache,
+            'incremental': self.incremental,
+            'index_max_age': self.index_max_age,
+            'progress': {'done': self.done, 'total': self.total},
+            'diff': self.diff,
+            'profile': self.profile,
+            'last_message': self.last_message,
+            'output_file': self.output_file,
+            'error': self.error,
+        }
+
+
+class FanOutJob(Job):
+    """One keyword searched on several sites at once.
+
+    Every site runs as its own child job; their products are normalized
+    to one schema, streamed as this job's events as they arrive and
+    appended to a combined CSV file.
+    """
+
+    def __init__(self, sites, keyword, num_products, use_cache=True, job_id=None, store=None):
+        super().__init__('all', keyword, num_products, use_cache=use_cache, job_id=job_id, store=store)
+        self.sites = list(sites)
+        self.children = {}
+        self.errors = {}
+        self._totals = {}
+        self._output = None
+        self._writer = None
+        self._closed = False
+        self._write_lock = threading.Lock()
+
+    def child_started(self, child):
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.time()
+            self.output_file = f"scraped_products_all_{self.id[:12]}.csv"
+            self._output = open(os.path.join(config.STATIC_DIR, self.output_file), 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._output, fieldnames=COLUMNS)
+            self._writer.writeheader()
+        self.set_status(RUNNING)
+        self.add_event({'event': 'export', 'files': [self.output_file]})
+
+    def child_event(self, child, event):
+        """Translate a child job's event into a combined event."""
+        site = get_site(child.site)
+        if event['event'] == 'links_found':
+            with self._lock:
+                self._totals[child.site] = event.get('count') or 0
+                total = sum(self._totals.values())
+            self.add_event({'event': 'links_found', 'site': child.site, 'count': total,
+                            'message': f"{site.title}: found {event.get('count')} products."})
+        elif event['event'] == 'product':
+            row = normalize(site, event['url'], event['row'])
+            with self._write_lock:
+                self._writer.writerow({column: '; '.join(value) if isinstance(value, list) else value
+                                       for column, value in row.items()})
+                self._output.flush()
+            self.add_event({'event': 'product', 'site': child.site, 'url': event['url'], 'row': row,
+                            'cached': event.get('cached', False)})
+        elif event['event'] == 'error':
+            self.add_event(dict(event, site=child.site, message=f"{site.title}: {event.get('message')}"))
+
+    def child_finished(self, child):
+        site = get_site(child.site)
+        if child.status == FAILED:
+            self.errors[child.site] = child.error
+            self.add_event({'event': 'site_failed', 'site': child.site, 'message': f"{site.title} failed: {child.error}"})
+        else:
+            self.add_event({'event': 'site_done', 'site': child.site, 'count': child.done, 'files': [child.output_file],
+                            'message': f"{site.title} finished with {child.done} products."})
+
+        with self._lock:
+            # Only the last child to finish closes the fan-out
+            if self._closed or not all(job.is_done for job in self.children.values()):
+                return
+            self._closed = True
+        with self._write_lock:
+            if self._output is not None:
+                self._output.close()
+        self.finished_at = time.time()
+        if len(self.errors) == len(self.children):
+            self.error = '; '.join(f"{name}: {error}" for name, error in self.errors.items())
+            self.set_status(FAILED)
+        else:
+            self.add_event({'event': 'done', 'count': self.done, 'output_file': self.output_file, 'files': [self.output_file]})
+            self.set_status(FINISHED)
+        print(f"Fan-out job {self.id} {self.status} with {self.done} products.")  # Debugging line
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['sites'] = {name: {'job_id': job.id, 'status': job.status, 'done': job.done, 'total': job.total}
+                         for name, job in self.children.items()}
+        data['errors'] = self.errors
+        return data
+
+
+class JobManager:
+    """Queues scrape jobs in the shared job store and runs them on worker threads.
+
+    Any process can submit jobs and read their state and events. Once
+    ``start()`` is called, a manager with ``max_workers`` above 0 also runs
+    that many worker threads, each claiming the oldest queued job from the
+    store and running it in-process on the shared browser pool, so the
+    Flask request that submitted the job returns straight away and the
+    scrape may run in whichever process claims it first.
+    """
+
+    def __init__(self, max_workers=config.JOB_WORKERS, store=None):
+        self.store = store if store is not None else job_store.get_store()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.max_workers = max_workers
+        # Jobs running in this process, kept for their heartbeats
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+        # One slot per scrape running in this process. A fan-out job doesn't
+        # hold one itself; each of its sites takes one like any other job
+        self._slots = threading.Semaphore(max(max_workers, 1))
+
+    def start(self):
+        """Start the worker threads (once); only processes that should run scrapes call this."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for index in range(self.max_workers):
+            threading.Thread(target=self._work, name=f'scrape-job-{index}', daemon=True).start()
+        if self.max_workers:
+            threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def submit(self, site_name, keyword, num_products, use_cache=True, incremental=False, index_max_age=None):
+        """Queue a scrape, or return the queued or running job already doing the same one.
+
+        A request that is identical to a queued or running job (in any
+        process) is attached to it and shares its event stream and output
+        files instead of starting a second scrape. A ``use_cache=False``
+        refresh only attaches to jobs that are not serving cached results
+        either. With ``index_max_age`` the search is answered from the
+        product index when it has enough matches scraped within that many
+        seconds. Returns the job's state.
+        """
+        site = get_site(site_name)
+        num_products = int(num_products)
+        if num_products < 1:
+            raise ValueError("num_products must be at least 1")
+
+        key = cache.search_key(site.name, keyword, num_products) + (incremental, index_max_age is not None)
+        job = Job(site.name, keyword, num_products, use_cache=use_cache, incremental=incremental,
+                  index_max_age=index_max_age)
+        submitted = self.store.submit(job.to_dict(), key, use_cache)
+        if submitted['job_id'] != job.id:
+            print(f"Attached request to in-flight job {submitted['job_id']}")  # Debugging line
+        self._wakeup.set()
+        return submitted
+
+    def submit_fanout(self, keyword, num_products, site_names=None, use_cache=True, index_max_age=None):
+        """Search every site in ``site_names`` (all registered sites by default) at once."""
+        sites = [get_site(name) for name in site_names] if site_names else all_sites()
+        sites = list({site.name: site for site in sites}.values())
+        num_products = int(num_products)
+        if num_products < 1:
+            raise ValueError("num_products must be at least 1")
+
+        fanout = FanOutJob([site.name for site in sites], keyword, num_products, use_cache=use_cache)
+        for site in sites:
+            fanout.children[site.name] = Job(site.name, keyword, num_products, use_cache=use_cache, parent=fanout,
+                                             index_max_age=index_max_age)
+        self.store.create([fanout.to_dict()] + [child.to_dict() for child in fanout.children.values()])
+        self._wakeup.set()
+        return fanout.to_dict()
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def list(self, limit=100):
+        return self.store.list(limit)
+
+    def wait_for_events(self, job_id, after=0, timeout=15):
+        """Block until ``job_id`` has events after the event id ``after`` or has ended.
+
+        Returns ``(events, done)`` with ``events`` a list of ``(event_id,
+        event)`` pairs. ``done`` means the job had ended before the events
+        were read, so no more will follow. An empty list with ``done``
+        False means the timeout passed first (callers use that to send
+        keep-alives).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            done = job is None or job['status'] in (FINISHED, FAILED)
+            events = self.store.events(job_id, after)
+            remaining = deadline - time.monotonic()
+            if events or done or remaining <= 0:
+                return events, done
+            # Events from this process wake the wait; those written by
+            # other processes are picked up on the next poll
+            self.store.wait(min(remaining, config.JOB_POLL_SECONDS))
+
+    def health(self):
+        with self._lock:
+            running = len(self._running)
+        return {'worker': self.worker_id, 'threads': self.max_workers, 'running': running,
+                'queued': self.store.count(QUEUED)}
+
+    def _work(self):
+        while True:
+            # Only claim a job once there is a free slot to run it in
+            self._slots.acquire()
+            try:
+                data = self.store.claim(self.worker_id)
+            except Exception as e:
+                print(f"Could not claim a job: {e}")  # Debugging line
+                data = None
+            if data is None:
+                self._slots.release()
+                self._wakeup.wait(config.JOB_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            print(f"Worker {self.worker_id} claimed job {data['job_id']}")  # Debugging line
+            try:
+                if data['site'] == 'all':
+                    self._slots.release()
+                    self._run_fanout(data)
+                else:
+                    try:
+                        self._run(Job.from_dict(data, store=self.store))
+                    finally:
+                        self._slots.release()
+            except Exception as e:
+                # E.g. the store was busy or the job row is broken; the
+                # thread keeps serving the queue
+                print(f"Job {data.get('job_id')} failed in worker {self.worker_id}: {e}")  # Debugging line
+                self._fail(data, e)
+
+    def _fail(self, data, error):
+        """Mark a claimed job (and a fan-out's unfinished children) as failed in the store."""
+        try:
+            jobs = [data]
+            if data.get('site') == 'all':
+                jobs += [child for child in self.store.children(data['job_id']) if child['status'] not in (FINISHED, FAILED)]
+            for job in jobs:
+                job.update(status=FAILED, error=str(error), finished_at=time.time())
+                self.store.save(job)
+                self.store.add_event(job['job_id'], {'event': 'error', 'message': str(error)})
+        except Exception as e:
+            # fail_stale picks the job up once its heartbeat runs out
+            print(f"Could not fail job {data.get('job_id')}: {e}")  # Debugging line
+
+    def _heartbeat(self):
+        pruned_at = time.monotonic() - PRUNE_INTERVAL
+        while True:
+            time.sleep(config.JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                running = list(self._running.values())
+            try:
+                for job in running:
+                    job.save()
+                failed = self.store.fail_stale(config.JOB_STALE_SECONDS)
+                if failed:
+                    print(f"Failed {len(failed)} jobs whose worker stopped responding")  # Debugging line
+                if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    pruned_at = time.monotonic()
+                    pruned = self.store.prune(config.JOB_RETENTION_SECONDS)
+                    if pruned:
+                        print(f"Deleted {pruned} old jobs from the job store")  # Debugging line
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")  # Debugging line
+
+    def _run_fanout(self, data):
+        fanout = FanOutJob(list(data['sites']), data['keyword'], data['num_products'],
+                           use_cache=data.get('use_cache', True), job_id=data['job_id'], store=self.store)
+        fanout.created_at = data['created_at']
+        for child in self.store.children(fanout.id):
+            fanout.children[child['site']] = Job.from_dict(child, parent=fanout, store=self.store)
+        with self._lock:
+            self._running[fanout.id] = fanout
+        try:
+            # The sites are searched side by side, as far as free slots allow
+            with ThreadPoolExecutor(max_workers=len(fanout.children), thread_name_prefix='fan-out') as executor:
+                futures = {executor.submit(self._run_child, child): child for child in fanout.children.values()}
+            for future, child in futures.items():
+                if future.exception() is not None:
+                    self._fail(child.to_dict(), future.exception())
+        finally:
+            with self._lock:
+                self._running.pop(fanout.id, None)
+
+    def _run_child(self, job):
+        with self._slots:
+            self._run(job)
+
+    def _run(self, job):
+        with self._lock:
+            self._running[job.id] = job
+        job.started_at = time.time()
+        metrics.job_queue_seconds.observe(job.started_at - job.created_at, site=job.site)
+        # Scrapers run in this thread and report through progress.emit; the
+        # sink is context-local so concurrent jobs don't see each other's events
+        progress.set_sink(job.add_event)
+        try:
+            job.set_status(RUNNING)
+            if job.parent is not None:
+                job.parent.child_started(job)
+            output_path = run_scrape(get_site(job.site), job.keyword, job.num_products, job_id=job.id,
+                                     use_cache=job.use_cache, incremental=job.incremental,
+                                     index_max_age=job.index_max_age)
+            output_file = os.path.basename(output_path)
+
+            job.output_file = output_file
+            job.finished_at = time.time()
+            job.set_status(FINISHED)
+            print(f"Job {job.id} complete. Data saved to '{output_file}'.")  # Debugging line
+        except Exception as e:
+            job.error = str(e)
+            job.add_event({'event': 'error', 'message': str(e)})
+            job.finished_at = time.time()
+            job.set_status(FAILED)
+            print(f"Job {job.id} failed: {e}")  # Debugging line
+        finally:
+            progress.set_sink(None)
+            with self._lock:
+                self._running.pop(job.id, None)
+            if job.parent is not None:
+                job.parent.child_finished(job)
@@ -0,0 +1,213 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# In-process metrics for the scrape hot path. Stage timers feed histograms
+# and counters that /metrics exposes in the Prometheus text format, and each
+# job also gets a profile: a timeline of the stages it went through, kept in
+# a context variable so browser pool tasks and HTTP fetch threads working
+# for the job (which run in copies of its context) add to it as well.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Observations bucketed per label set, Prometheus style (cumulative buckets)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((self.name + '_bucket', key + (_number(bound),), count))
+                samples.append((self.name + '_sum', key, total))
+                samples.append((self.name + '_count', key, counts[-1]))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                names = metric.labels + (('le',) if name.endswith('_bucket') else ())
+                lines.append(f"{name}{_label_text(names, key)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    'scraper_stage_seconds', 'Time spent in each scrape stage.', labels=('site', 'stage')))
+jobs_total = registry.register(Counter(
+    'scraper_jobs_total', 'Scrape jobs by how they ended.', labels=('site', 'status')))
+job_seconds = registry.register(Histogram(
+    'scraper_job_seconds', 'Wall time of whole scrape jobs.', labels=('site',)))
+job_queue_seconds = registry.register(Histogram(
+    'scraper_job_queue_seconds', 'Time jobs waited for a free worker.', labels=('site',)))
+products_total = registry.register(Counter(
+    'scraper_products_total', 'Products scraped, by where they came from.', labels=('site', 'source')))
+page_errors_total = registry.register(Counter(
+    'scraper_page_errors_total', 'Product pages that could not be scraped.', labels=('site',)))
+db_rows_total = registry.register(Counter(
+    'scraper_db_rows_total', 'Rows written to the database.', labels=('table',)))
+retries_total = registry.register(Counter(
+    'scraper_retries_total', 'Requests retried after a failure.', labels=('domain',)))
+circuit_trips_total = registry.register(Counter(
+    'scraper_circuit_trips_total', 'Times a domain stopped getting requests after repeated failures.', labels=('domain',)))
+index_products_total = registry.register(Counter(
+    'scraper_index_products_total', 'Products added to or refreshed in the search index.', labels=('site',)))
+request_seconds = registry.register(Histogram(
+    'app_request_seconds', 'Time spent handling app requests.', labels=('endpoint',)))
+
+
+class Profile:
+    """The stage timeline of one job."""
+
+    def __init__(self, job_id, site):
+        self.job_id = job_id
+        self.site = site
+        self.started = time.time()
+        self._origin = time.monotonic()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, seconds, **details):
+        with self._lock:
+            self.events.append(dict(details, stage=stage, start=round(start - self._origin, 6),
+                                    seconds=round(seconds, 6), thread=threading.current_thread().name))
+
+    def summary(self):
+        """Count, total and slowest time of every stage."""
+        stages = {}
+        with self._lock:
+            for event in self.events:
+                stage = stages.setdefault(event['stage'], {'count': 0, 'total': 0.0, 'max': 0.0})
+                stage['count'] += 1
+                stage['total'] += event['seconds']
+                stage['max'] = max(stage['max'], event['seconds'])
+        for stage in stages.values():
+            stage['total'] = round(stage['total'], 6)
+        return stages
+
+    def to_dict(self):
+        with self._lock:
+            events = list(self.events)
+        return {'job_id': self.job_id, 'site': self.site, 'started': self.started,
+                'stages': self.summary(), 'events': events}
+
+
+_profile = contextvars.ContextVar('job_profile', default=None)
+
+
+def start_profile(job_id, site):
+    profile = Profile(job_id, site)
+    _profile.set(profile)
+    return profile
+
+
+def current_profile():
+    return _profile.get()
+
+
+def end_profile(profile):
+    """Detach ``profile`` from the current context and dump it if SCRAPER_PROFILE_DIR is set."""
+    _profile.set(None)
+    if not config.PROFILE_DIR:
+        return None
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(config.PROFILE_DIR, f"{profile.job_id}.json")
+    with open(path, 'w') as f:
+        json.dump(profile.to_dict(), f, indent=2, default=str)
+    return path
+
+
+@contextmanager
+def timer(stage, site=None, **details):
+    """Time the block as ``stage``, for the histogram and the current job's profile."""
+    profile = _profile.get()
+    if site is None:
+        site = profile.site if profile is not None else ''
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - start
+        stage_seconds.observe(seconds, site=site, stage=stage)
+        if profile is not None:
+            profile.add(stage, start, seconds, **details)
+
+
+def render():
+    return registry.render()
@@ -0,0 +1,108 @@
+import threading
+from urllib.parse import urlparse
+
+import config
+
+# Lightweight page loading: requests a scrape never needs (images, video,
+# fonts, analytics and ad trackers) are aborted before they leave the
+# browser. Sites can change what is blocked and allowlist URLs that must
+# always load.
+
+DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font')
+
+TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googleadservices.com',
+    'googlesyndication.com',
+    'facebook.net',
+    'facebook.com',
+    'hotjar.com',
+    'segment.com',
+    'segment.io',
+    'klaviyo.com',
+    'bing.com',
+    'pinterest.com',
+    'tiktok.com',
+    'snapchat.com',
+    'criteo.com',
+    'criteo.net',
+    'attn.tv',
+    'attentivemobile.com',
+    'yotpo.com',
+    'nosto.com',
+    'cookielaw.org',
+    'onetrust.com',
+    'newrelic.com',
+    'nr-data.net',
+    'clarity.ms',
+)
+
+# Rough transfer sizes used to estimate what blocking a request saved; the
+# browser never downloads an aborted request so its real size is unknown
+AVERAGE_BYTES = {
+    'image': 60_000,
+    'media': 500_000,
+    'font': 40_000,
+    'script': 30_000,
+    'stylesheet': 20_000,
+}
+DEFAULT_AVERAGE_BYTES = 5_000
+
+
+class NetworkStats:
+    """Counts allowed and blocked requests for one scrape."""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = {}
+        self._lock = threading.Lock()
+
+    def record(self, resource_type, blocked):
+        with self._lock:
+            if blocked:
+                self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+            else:
+                self.allowed += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'allowed_requests': self.allowed,
+                'blocked_requests': dict(self.blocked),
+                'estimated_bytes_saved': sum(
+                    AVERAGE_BYTES.get(resource_type, DEFAULT_AVERAGE_BYTES) * count
+                    for resource_type, count in self.blocked.items()
+                ),
+            }
+
+
+def _matches_domain(host, domains):
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def should_block(site, url, resource_type):
+    if any(pattern in url for pattern in site.allowed_url_patterns):
+        return False
+    if resource_type in site.blocked_resource_types:
+        return True
+    return _matches_domain(urlparse(url).hostname or '', site.blocked_domains)
+
+
+def apply(context, site, stats=None):
+    """Install ``site``'s blocking profile on a browser context."""
+    if not config.BLOCK_RESOURCES:
+        return
+
+    def handle(route):
+        request = route.request
+        blocked = should_block(site, request.url, request.resource_type)
+        if stats is not None:
+            stats.record(request.resource_type, blocked)
+        if blocked:
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route('**/*', handle)
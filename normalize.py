@@ -0,0 +1,135 @@
+import re
+
+# One schema for products from every retailer, so results from different
+# sites can be listed and compared side by side. Each site maps the
+# normalized fields to its own product fields (Site.normalized_fields);
+# values a site filled with its "not found" default become None.
+#
+# normalize() maps a single product as it streams in; normalize_frame()
+# parses a whole batch at once with vectorized pandas string operations
+# into typed columns (pandas is only imported when it is used).
+
+COLUMNS = ['site', 'name', 'price', 'original_price', 'sizes', 'colors', 'rating', 'reviews', 'product_url']
+
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_LIST_SEPARATOR = re.compile(r'\s*[;,\n]\s*')
+
+NUMBER_PATTERN = r'(\d+(?:\.\d+)?)'
+LIST_PATTERN = _LIST_SEPARATOR.pattern
+
+
+def parse_number(text):
+    """The first number in ``text`` ("$1,029.99" -> 1029.99), or None."""
+    if text is None or isinstance(text, bool):
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER.search(str(text))
+    return float(match.group().replace(',', '')) if match else None
+
+
+def parse_count(text):
+    """A whole number such as a review count ("(1,204)" -> 1204), or None."""
+    number = parse_number(text)
+    return int(number) if number is not None else None
+
+
+def split_list(text):
+    """Split a joined list of values ("S, M; L") into a list without duplicates."""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        return list(dict.fromkeys(text))
+    return list(dict.fromkeys(value for value in _LIST_SEPARATOR.split(str(text)) if value))
+
+
+def clean_text(text):
+    if text is None:
+        return None
+    return ' '.join(str(text).split()) or None
+
+
+PARSERS = {
+    'name': clean_text,
+    'price': parse_number,
+    'original_price': parse_number,
+    'sizes': split_list,
+    'colors': split_list,
+    'rating': parse_number,
+    'reviews': parse_count,
+}
+
+# Column kind for the vectorized parsers
+KINDS = {
+    'name': 'text',
+    'price': 'number',
+    'original_price': 'number',
+    'sizes': 'list',
+    'colors': 'list',
+    'rating': 'number',
+    'reviews': 'count',
+}
+
+
+def normalize(site, product_url, product):
+    """Map one product of ``site`` onto the normalized schema."""
+    row = {'site': site.name, 'product_url': product_url}
+    for column, parse in PARSERS.items():
+        field = site.normalized_fields.get(column)
+        value = product.get(field) if field else None
+        if field and value == site.product_fields.get(field, {}).get('default'):
+            value = None
+        row[column] = parse(value)
+    return row
+
+
+def _numbers(pd, series):
+    text = series.astype('string').str.replace(',', '', regex=False)
+    return pd.to_numeric(text.str.extract(NUMBER_PATTERN, expand=False), errors='coerce')
+
+
+def _lists(pd, series):
+    # Split every value at once, then drop blanks and repeats per row
+    values = series.astype('string').fillna('').str.split(LIST_PATTERN, regex=True).explode().str.strip()
+    values = values[values.fillna('') != '']
+    values = values[~values.reset_index().duplicated().to_numpy()]
+    lists = values.groupby(level=0).agg(list).reindex(series.index).astype('object')
+    # Rows with no values get their own empty list
+    missing = lists.isna()
+    lists[missing] = pd.Series([[] for _ in range(int(missing.sum()))], index=lists.index[missing], dtype='object')
+    return lists
+
+
+def normalize_frame(site, products):
+    """Normalize ``products`` (dicts with a ``product_url``) of ``site`` into a typed DataFrame.
+
+    Prices and ratings become float columns, review counts nullable
+    integers, sizes and colors lists and the site a category; missing
+    values are NA. ``discount`` is the fraction off the original price.
+    """
+    import pandas as pd
+
+    raw = pd.DataFrame.from_records(list(products))
+    frame = pd.DataFrame(index=raw.index)
+    frame['site'] = pd.Series(site.name, index=raw.index, dtype='category')
+    for column, kind in KINDS.items():
+        field = site.normalized_fields.get(column)
+        if field and field in raw:
+            series = raw[field]
+            default = site.product_fields.get(field, {}).get('default')
+            if default is not None:
+                series = series.mask(series == default)
+        else:
+            series = pd.Series(None, index=raw.index, dtype='object')
+
+        if kind == 'number':
+            frame[column] = _numbers(pd, series).astype('float64')
+        elif kind == 'count':
+            frame[column] = _numbers(pd, series).round().astype('Int64')
+        elif kind == 'list':
+            frame[column] = _lists(pd, series)
+        else:
+            frame[column] = series.astype('string').str.split().str.join(' ').astype('string').replace('', pd.NA)
+    frame['product_url'] = raw['product_url'] if 'product_url' in raw else pd.NA
+    frame['discount'] = (1 - frame['price'] / frame['original_price']).where(frame['original_price'] > 0)
+    return frame
@@ -0,0 +1,102 @@
+import collections
+import threading
+
+import browser_pool
+import config
+import metrics
+import scheduler
+
+
+def _load(page, url, goto_options):
+    with metrics.timer('page_load', url=url):
+        response = page.goto(url, **goto_options)
+    if response is not None:
+        scheduler.check_status(response.status, response.headers)
+    return response
+
+
+class PageStage:
+    """Browser lanes that scrape URLs as they are handed in with ``put``.
+
+    Lanes run as tasks on the shared browser pool. They are started when
+    work arrives, up to ``concurrency`` of them, and end as soon as they
+    find nothing left to do, so an idle stage holds no browser. Each lane
+    reuses one page for every URL it takes. ``join()`` waits until every
+    URL put so far has been scraped.
+    """
+
+    def __init__(self, scrape_fn, concurrency=config.PAGE_CONCURRENCY, domain=None, pool=None,
+                 on_result=None, setup=None, goto_options=None):
+        self.scrape_fn = scrape_fn
+        self.concurrency = max(1, concurrency)
+        self.domain = domain
+        self.pool = pool if pool is not None else browser_pool.get_pool()
+        self.on_result = on_result
+        self.setup = setup
+        self.goto_options = goto_options or {}
+        self._work = collections.deque()
+        self._active = 0
+        self._lanes = []
+        self._lock = threading.Lock()
+
+    def put(self, url, index=None):
+        with self._lock:
+            if self.domain is None:
+                self.domain = scheduler.for_url(url)
+            self._work.append((index, url))
+            if self._active < self.concurrency:
+                self._active += 1
+                self._lanes.append(self.pool.submit(self._run_lane))
+
+    def cancel(self):
+        """Drop the URLs that no lane has started on."""
+        with self._lock:
+            self._work.clear()
+
+    def _next(self):
+        with self._lock:
+            if self._work:
+                return self._work.popleft()
+            # Deciding to stop under the lock means put() starts a new
+            # lane for anything that arrives after this
+            self._active -= 1
+            return None
+
+    def _run_lane(self, context):
+        try:
+            if self.setup is not None:
+                self.setup(context)
+            page = context.new_page()
+        except BaseException:
+            with self._lock:
+                self._active -= 1
+            raise
+
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            index, url = item
+            error = None
+            try:
+                # Failed loads are retried with backoff on the same page; once
+                # the domain's circuit is open the remaining URLs fail fast.
+                # Extraction runs outside: a page missing a field is not the
+                # domain failing
+                response = self.domain.call(lambda: _load(page, url, self.goto_options))
+                data = self.scrape_fn(page, response)
+            except Exception as e:
+                data = None
+                error = str(e)
+            if self.on_result is not None:
+                self.on_result(index, url, data, error)
+
+    def join(self):
+        index = 0
+        while True:
+            with self._lock:
+                if index == len(self._lanes):
+                    return
+                lane = self._lanes[index]
+            lane.result()
+            index += 1
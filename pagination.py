@@ -0,0 +1,88 @@
+import config
+
+# Event-driven helpers for search result grids. Instead of sleeping a fixed
+# time after each scroll, the page is asked to report as soon as the grid
+# has grown; when it stops growing within the timeout the results are
+# exhausted. Results spread over several pages are followed through a
+# "load more" button or "next page" links.
+
+# Absolute URL of the first link in each result from index ``start`` on
+RESULT_LINKS_JS = """
+([selector, start]) => Array.from(document.querySelectorAll(selector)).slice(start).map((item) => {
+    const link = item.matches('a[href]') ? item : item.querySelector('a[href]');
+    return link ? link.href : null;
+})
+"""
+
+GRID_GREW_JS = "([selector, count]) => document.querySelectorAll(selector).length > count"
+
+# Target of the first link matching the selector, or null
+NEXT_PAGE_JS = """
+(selector) => {
+    const link = document.querySelector(selector);
+    return link && link.href ? link.href : null;
+}
+"""
+
+
+def wait_for_growth(page, selector, count, timeout=config.SCROLL_TIMEOUT):
+    """Wait until more than ``count`` elements match ``selector``.
+
+    Returns False if the grid did not grow within ``timeout`` seconds.
+    """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    try:
+        page.wait_for_function(GRID_GREW_JS, arg=[selector, count], timeout=timeout * 1000)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+# Function to read the product links of every results page as it loads
+def iter_result_links(page, selector, num_products, scroll=False, load_more=None, next_page=None,
+                      goto=None, timeout=config.SCROLL_TIMEOUT):
+    """Yield batches of new product URLs, in grid order, until ``num_products`` were found.
+
+    Only the results added since the previous pass are read. When more
+    are needed the next batch comes from scrolling to the bottom
+    (``scroll``), clicking the ``load_more`` button, or opening the link
+    matching ``next_page`` with ``goto(url)`` (``page.goto`` by default).
+    It stops when the results are exhausted or don't grow within
+    ``timeout`` seconds.
+    """
+    found = set()
+    visited = {page.url}
+    seen = 0
+    while True:
+        new_links = page.evaluate(RESULT_LINKS_JS, [selector, seen])
+        seen += len(new_links)
+        batch = [link for link in dict.fromkeys(new_links) if link and link not in found][:num_products - len(found)]
+        found.update(batch)
+        if batch:
+            yield batch
+        if len(found) >= num_products:
+            return
+
+        if scroll:
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        elif load_more and page.query_selector(load_more):
+            page.click(load_more)
+        elif next_page:
+            url = page.evaluate(NEXT_PAGE_JS, next_page)
+            if not url or url in visited:
+                return
+            visited.add(url)
+            if goto is not None:
+                goto(url)
+            else:
+                page.goto(url)
+            # A new page starts a new grid
+            seen = 0
+            if not wait_for_growth(page, selector, 0, timeout):
+                return
+            continue
+        else:
+            return
+        if not wait_for_growth(page, selector, seen, timeout):
+            return
@@ -0,0 +1,143 @@
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import http_fastpath
+from page_pool import PageStage
+
+# Producer/consumer plumbing for live scrapes. Link discovery walks the
+# search results (scrolling, "load more" or following result pages) and
+# puts each product link into a bounded LinkQueue as soon as it is read;
+# the job thread takes them off in batches and hands the ones it can't
+# answer from a cache to a Fetcher, which scrapes them concurrently (over
+# plain HTTP first when the site allows it, in browser lanes otherwise)
+# while discovery is still running.
+
+
+class LinkQueue:
+    """Bounded queue of unique product links, closed by the producer when it is done."""
+
+    _CLOSED = object()
+
+    def __init__(self, limit, maxsize=config.LINK_QUEUE_SIZE):
+        self.limit = limit
+        self.cancelled = False
+        self._queue = queue.Queue(maxsize)
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        with self._lock:
+            return len(self._seen)
+
+    @property
+    def full(self):
+        return self.count >= self.limit
+
+    def put(self, link):
+        """Queue ``link`` unless it was seen before or the limit is reached. Blocks while the queue is full."""
+        with self._lock:
+            if link in self._seen or len(self._seen) >= self.limit:
+                return
+            self._seen.add(link)
+        self._offer(link)
+
+    def close(self):
+        self._offer(self._CLOSED)
+
+    def cancel(self):
+        """Stop accepting links; a producer blocked on a full queue gives up."""
+        self.cancelled = True
+
+    def _offer(self, item):
+        while not self.cancelled:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def batches(self):
+        """Yield lists of the links queued since the last batch, until the queue is closed."""
+        while True:
+            item = self._queue.get()
+            if item is self._CLOSED:
+                return
+            batch = [item]
+            closed = False
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._CLOSED:
+                    closed = True
+                    break
+                batch.append(item)
+            yield batch
+            if closed:
+                return
+
+
+class Fetcher:
+    """Scrapes product pages as their links arrive.
+
+    Each URL is tried over HTTP first when ``use_http`` is set and goes to
+    the browser lanes only when that fails. ``on_result(index, url, data,
+    error)`` is called as each page is done; ``finish()`` waits for every
+    page put so far and returns ``{url: data}`` with ``sources`` counting
+    how many came over HTTP and how many from a browser.
+    """
+
+    def __init__(self, site, scrape_fn, pool=None, on_result=None, setup=None, goto_options=None,
+                 use_http=False, concurrency=config.PAGE_CONCURRENCY):
+        self.site = site
+        self.on_result = on_result
+        self.results = {}
+        self.sources = {'http': 0, 'browser': 0}
+        self._lock = threading.Lock()
+        self._browser = PageStage(scrape_fn, concurrency, site.scheduler, pool, self._browser_done, setup, goto_options)
+        self._http = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='http-fetch') if use_http else None
+        self._http_futures = []
+
+    def put(self, url, index=None):
+        if self._http is None:
+            self._browser.put(url, index)
+            return
+        # Each fetch runs in a copy of the caller's context so its progress
+        # events reach the job that started the scrape
+        self._http_futures.append(self._http.submit(contextvars.copy_context().run, self._fetch_http, url, index))
+
+    def _fetch_http(self, url, index):
+        data = http_fastpath.fetch_one(self.site, url)
+        if data is None:
+            self._browser.put(url, index)
+            return
+        self._record(index, url, data, None, 'http')
+
+    def _browser_done(self, index, url, data, error):
+        self._record(index, url, data, error, 'browser')
+
+    def _record(self, index, url, data, error, source):
+        if data:
+            with self._lock:
+                self.results[url] = data
+                self.sources[source] += 1
+        if self.on_result is not None:
+            self.on_result(index, url, data, error)
+
+    def finish(self):
+        if self._http is not None:
+            self._http.shutdown(wait=True)
+            for future in self._http_futures:
+                future.result()
+        self._browser.join()
+        return self.results
+
+    def cancel(self):
+        if self._http is not None:
+            self._http.shutdown(wait=False, cancel_futures=True)
+        self._browser.cancel()
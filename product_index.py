@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import config
+import metrics
+from normalize import normalize
+
+# Local full-text index of every product the scrapers have seen, so a
+# keyword can be answered from products scraped before instead of a live
+# search on the retailer site. It is an SQLite FTS5 table (an on-disk
+# inverted index ranked with BM25) over each product's name, features,
+# materials, colors and sizes; which product fields feed those columns is
+# set per site in Site.index_fields. Every scrape upserts the products it
+# returned, keyed on site and URL, in batches while it runs (see
+# IndexWriter), so the index grows as the sites are scraped and never
+# needs a rebuild.
+
+COLUMNS = ['name', 'features', 'materials', 'colors', 'sizes']
+
+# BM25 weight of each column: a keyword in the name counts most
+WEIGHTS = {'name': 10.0, 'features': 2.0, 'materials': 1.0, 'colors': 3.0, 'sizes': 1.0}
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS indexed_products (
+        doc_id INTEGER PRIMARY KEY,
+        site TEXT NOT NULL,
+        product_url TEXT NOT NULL,
+        data TEXT NOT NULL,
+        indexed_at REAL NOT NULL,
+        UNIQUE (site, product_url)
+    )""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS product_index USING fts5(
+        {', '.join(COLUMNS)},
+        tokenize = 'porter unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+]
+
+_TERM = re.compile(r'\w+')
+
+# Products a running scrape collects before they are written to the index
+BATCH_SIZE = 20
+
+_local = threading.local()
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _connect():
+    # One connection per thread; WAL lets searches run while a scrape writes
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(config.INDEX_PATH)), exist_ok=True)
+        conn = sqlite3.connect(config.INDEX_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    global _schema_ready
+    with _schema_lock:
+        if not _schema_ready:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _schema_ready = True
+    return conn
+
+
+def _text(site, fields, product):
+    values = []
+    for field in fields:
+        value = product.get(field)
+        if not value or value == site.product_fields.get(field, {}).get('default'):
+            continue
+        values.extend(value if isinstance(value, (list, tuple)) else [value])
+    return ' '.join(str(value) for value in values)
+
+
+# Function to add or refresh scraped products in the index
+def add(site, products):
+    """Upsert ``products`` (a list of ``(url, product_dict)``) of ``site``; returns how many were indexed."""
+    if not products:
+        return 0
+    now = time.time()
+    conn = _connect()
+    with conn:
+        for product_url, product in products:
+            data = json.dumps(product, default=str)
+            row = conn.execute("SELECT doc_id FROM indexed_products WHERE site = ? AND product_url = ?",
+                               (site.name, product_url)).fetchone()
+            if row is None:
+                doc_id = conn.execute("INSERT INTO indexed_products (site, product_url, data, indexed_at) VALUES (?, ?, ?, ?)",
+                                      (site.name, product_url, data, now)).lastrowid
+            else:
+                doc_id = row[0]
+                conn.execute("UPDATE indexed_products SET data = ?, indexed_at = ? WHERE doc_id = ?", (data, now, doc_id))
+                conn.execute("DELETE FROM product_index WHERE rowid = ?", (doc_id,))
+            texts = [_text(site, site.index_fields.get(column, ()), product) for column in COLUMNS]
+            conn.execute(f"INSERT INTO product_index (rowid, {', '.join(COLUMNS)}) VALUES (?, {', '.join('?' * len(COLUMNS))})",
+                         [doc_id] + texts)
+    metrics.index_products_total.inc(len(products), site=site.name)
+    return len(products)
+
+
+class IndexWriter:
+    """Indexes the products of a running scrape of ``site`` in batches.
+
+    ``add()`` may be called from any thread as products are scraped; a
+    batch is written once ``batch_size`` products are waiting and
+    ``flush()`` writes the rest, so the products of a scrape that fails
+    part way are indexed too. Errors go to ``on_error`` instead of failing
+    the scrape.
+    """
+
+    def __init__(self, site, batch_size=BATCH_SIZE, on_error=None):
+        self.site = site
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, product_url, product):
+        with self._lock:
+            self._pending[product_url] = product
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.items()), {}
+            if not batch:
+                return
+            try:
+                with metrics.timer('index_update'):
+                    add(self.site, batch)
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(e)
+
+
+def match_query(text, prefix=False):
+    """FTS5 query matching every word of ``text`` (the last one as a prefix with ``prefix``), or None."""
+    terms = _TERM.findall(text.lower())
+    if not terms:
+        return None
+    query = ' '.join(f'"{term}"' for term in terms)
+    return query + '*' if prefix else query
+
+
+def search(text, sites=None, limit=20, max_age=None, prefix=False):
+    """Indexed products matching ``text``, best match first.
+
+    ``sites`` limits the matches to those site names and ``max_age`` to
+    products scraped in the last ``max_age`` seconds. Each match has the
+    site, URL, BM25 score (lower is better), when it was indexed, the
+    stored product fields and the product on the normalized schema.
+    """
+    from sites import get_site
+
+    query = match_query(text, prefix)
+    if query is None:
+        return []
+    weights = ', '.join(str(WEIGHTS[column]) for column in COLUMNS)
+    sql = (f"SELECT p.site, p.product_url, p.data, p.indexed_at, bm25(product_index, {weights}) AS score "
+           "FROM product_index JOIN indexed_products p ON p.doc_id = product_index.rowid "
+           "WHERE product_index MATCH ?")
+    params = [query]
+    if sites:
+        sql += f" AND p.site IN ({', '.join('?' * len(sites))})"
+        params.extend(sites)
+    if max_age is not None:
+        sql += " AND p.indexed_at >= ?"
+        params.append(time.time() - max_age)
+    # Ties (common words score alike in a small catalog) go to the freshest
+    sql += " ORDER BY score, p.indexed_at DESC LIMIT ?"
+    params.append(int(limit))
+
+    with metrics.timer('index_search'):
+        rows = _connect().execute(sql, params).fetchall()
+    matches = []
+    for site_name, product_url, data, indexed_at, score in rows:
+        product = json.loads(data)
+        matches.append({
+            'site': site_name,
+            'product_url': product_url,
+            'score': score,
+            'indexed_at': indexed_at,
+            'product': product,
+            'normalized': normalize(get_site(site_name), product_url, product),
+        })
+    return matches
+
+
+def lookup(site, keyword, num_products, max_age):
+    """``(url, product)`` pairs answering a search of ``site`` for ``keyword`` from the index.
+
+    Returns None unless at least ``num_products`` products matching every
+    word of the keyword were scraped in the last ``max_age`` seconds.
+    """
+    matches = search(keyword, sites=[site.name], limit=num_products, max_age=max_age)
+    if len(matches) < num_products:
+        return None
+    return [(match['product_url'], match['product']) for match in matches]
+
+
+def stats():
+    conn = _connect()
+    rows = conn.execute("SELECT site, COUNT(*), MAX(indexed_at) FROM indexed_products GROUP BY site").fetchall()
+    return {site: {'products': count, 'last_indexed_at': last} for site, count, last in rows}
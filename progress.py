@@ -0,0 +1,34 @@
+import contextvars
+import json
+import threading
+
+# Scrapers report structured progress events through this module. The job
+# running a scrape installs a sink that receives them directly. The sink
+# lives in a context variable so that concurrent jobs (and the browser pool
+# tasks they submit) each report to their own job. Without a sink, e.g. when
+# a scraper is run from the command line, the events are printed as single
+# prefixed JSON lines.
+
+PREFIX = '@@progress '
+
+_sink = contextvars.ContextVar('progress_sink', default=None)
+_lock = threading.Lock()
+
+
+def set_sink(sink):
+    """Send events from the current context to ``sink(event_dict)`` instead of stdout (None resets)."""
+    _sink.set(sink)
+
+
+def emit(event, **data):
+    """Report a progress event such as ``links_found``, ``product`` or ``error``."""
+    payload = {'event': event}
+    payload.update(data)
+    sink = _sink.get()
+    if sink is not None:
+        sink(payload)
+    else:
+        line = PREFIX + json.dumps(payload, default=str)
+        # Product pages are scraped from several threads, keep lines whole
+        with _lock:
+            print(line, flush=True)
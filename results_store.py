@@ -0,0 +1,378 @@
+import json
+import threading
+from datetime import datetime
+
+import config
+import db
+import metrics
+
+# Durable store for scrape results. Every job is recorded in scrape_jobs,
+# every product page ever scraped has one row in products (keyed on site
+# and URL), and each time a job scrapes a product a snapshot of the
+# extracted fields is added to product_snapshots. job_results lists every
+# product of every job; an incremental refresh only adds snapshots for new
+# and changed products and points the unchanged ones at their previous
+# snapshot. For incremental refreshes the store also keeps each product's
+# latest fingerprint and HTTP validators, and the list of product URLs
+# each search returned.
+
+if config.DB_BACKEND == 'sqlite':
+    _ID = "INTEGER PRIMARY KEY AUTOINCREMENT"
+else:
+    _ID = "INT AUTO_INCREMENT PRIMARY KEY"
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS scrape_jobs (
+        job_id VARCHAR(32) PRIMARY KEY,
+        site VARCHAR(64) NOT NULL,
+        keyword VARCHAR(255) NOT NULL,
+        num_products INT NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        product_count INT NOT NULL DEFAULT 0,
+        output_file VARCHAR(255),
+        error TEXT,
+        created_at DATETIME NOT NULL,
+        finished_at DATETIME
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS products (
+        product_id {_ID},
+        site VARCHAR(64) NOT NULL,
+        product_url VARCHAR(512) NOT NULL,
+        product_name VARCHAR(512),
+        first_seen DATETIME NOT NULL,
+        last_seen DATETIME NOT NULL,
+        UNIQUE (site, product_url)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS product_snapshots (
+        snapshot_id {_ID},
+        job_id VARCHAR(32) NOT NULL,
+        product_id INT NOT NULL,
+        scraped_at DATETIME NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    # The products of each job in result order, pointing at the snapshot
+    # that holds each one's data (an earlier job's for unchanged products)
+    """CREATE TABLE IF NOT EXISTS job_results (
+        job_id VARCHAR(32) NOT NULL,
+        position INT NOT NULL,
+        snapshot_id INT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS product_fingerprints (
+        site VARCHAR(64) NOT NULL,
+        product_url VARCHAR(512) NOT NULL,
+        fingerprint CHAR(40) NOT NULL,
+        etag VARCHAR(255),
+        last_modified VARCHAR(64),
+        checked_at DATETIME NOT NULL,
+        UNIQUE (site, product_url)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS search_snapshots (
+        search_snapshot_id {_ID},
+        job_id VARCHAR(32) NOT NULL,
+        site VARCHAR(64) NOT NULL,
+        keyword VARCHAR(255) NOT NULL,
+        num_products INT,
+        product_urls TEXT NOT NULL,
+        diff TEXT,
+        taken_at DATETIME NOT NULL
+    )""",
+]
+
+INDEXES = [
+    ('idx_scrape_jobs_site_keyword', 'scrape_jobs', 'site, keyword'),
+    ('idx_scrape_jobs_created_at', 'scrape_jobs', 'created_at'),
+    ('idx_products_url', 'products', 'product_url'),
+    ('idx_products_last_seen', 'products', 'last_seen'),
+    ('idx_snapshots_job', 'product_snapshots', 'job_id'),
+    ('idx_snapshots_product_time', 'product_snapshots', 'product_id, scraped_at'),
+    ('idx_job_results_job', 'job_results', 'job_id, position'),
+    ('idx_search_snapshots_search', 'search_snapshots', 'site, keyword, taken_at'),
+    ('idx_search_snapshots_job', 'search_snapshots', 'job_id'),
+]
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def normalize_keyword(keyword):
+    return ' '.join(keyword.lower().split())
+
+
+def init_schema():
+    """Create the results tables and indexes if they don't exist yet."""
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with db.get_pool().connection() as conn:
+            cursor = conn.cursor()
+            for statement in TABLES:
+                cursor.execute(statement)
+            for name, table, columns in INDEXES:
+                db.create_index(cursor, name, table, columns)
+            conn.commit()
+            cursor.close()
+        _schema_ready = True
+
+
+def _query(query, params=()):
+    init_schema()
+    with db.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(db.sql(query), params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.close()
+    return rows
+
+
+def _execute(query, params=()):
+    init_schema()
+    with db.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(db.sql(query), params)
+        conn.commit()
+        cursor.close()
+
+
+# Function to record a new scrape job
+def start_job(job_id, site, keyword, num_products):
+    _execute(
+        "INSERT INTO scrape_jobs (job_id, site, keyword, num_products, status, created_at) VALUES (%s, %s, %s, %s, %s, %s)",
+        (job_id, site, normalize_keyword(keyword), num_products, 'running', _now()),
+    )
+
+
+# Function to record how a scrape job ended
+def finish_job(job_id, status, product_count=0, output_file=None, error=None):
+    _execute(
+        "UPDATE scrape_jobs SET status = %s, product_count = %s, output_file = %s, error = %s, finished_at = %s WHERE job_id = %s",
+        (status, product_count, output_file, error, _now(), job_id),
+    )
+
+
+# Function to store the products a job scraped
+def save_products(job_id, site, products, name_field=None, changed=None):
+    """Store ``products`` (a list of ``(url, product_dict)``) as the results of ``job_id``.
+
+    Products are upserted on (site, URL) and every product gets a row in
+    job_results, all in a single transaction with batched statements. A
+    snapshot is added for the URLs in ``changed`` (all of them when None);
+    the others point at their latest stored snapshot. The upsert lets
+    concurrent jobs store the same product without one of them failing on
+    the unique key.
+    """
+    if not products:
+        return
+    init_schema()
+    now = _now()
+    urls = list(dict.fromkeys(url for url, _ in products))
+    names = {url: product.get(name_field) if name_field else None for url, product in products}
+
+    if config.DB_BACKEND == 'sqlite':
+        upsert = ("INSERT INTO products (site, product_url, product_name, first_seen, last_seen) VALUES (%s, %s, %s, %s, %s) "
+                  "ON CONFLICT (site, product_url) DO UPDATE SET product_name = excluded.product_name, last_seen = excluded.last_seen")
+    else:
+        upsert = ("INSERT INTO products (site, product_url, product_name, first_seen, last_seen) VALUES (%s, %s, %s, %s, %s) "
+                  "ON DUPLICATE KEY UPDATE product_name = VALUES(product_name), last_seen = VALUES(last_seen)")
+
+    with db.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(db.sql(upsert), [(site, url, names[url], now, now) for url in urls])
+
+        # Read the ids back, whichever job inserted the rows
+        cursor.execute(
+            db.sql(f"SELECT product_id, product_url FROM products WHERE site = %s AND product_url IN ({_in_clause(urls)})"),
+            [site] + urls,
+        )
+        ids = {url: product_id for product_id, url in cursor.fetchall()}
+
+        snapshots = {}
+        unchanged = [url for url in urls if changed is not None and url not in changed]
+        if unchanged:
+            cursor.execute(
+                db.sql("SELECT product_id, MAX(snapshot_id) FROM product_snapshots "
+                       f"WHERE product_id IN ({_in_clause(unchanged)}) GROUP BY product_id"),
+                [ids[url] for url in unchanged],
+            )
+            latest = dict(cursor.fetchall())
+            snapshots = {url: latest[ids[url]] for url in unchanged if ids[url] in latest}
+        # Products without a usable earlier snapshot get one of their own
+        new_rows = list({url: (job_id, ids[url], now, json.dumps(product, default=str))
+                         for url, product in products if url not in snapshots}.values())
+        if new_rows:
+            cursor.executemany(
+                db.sql("INSERT INTO product_snapshots (job_id, product_id, scraped_at, data) VALUES (%s, %s, %s, %s)"),
+                new_rows,
+            )
+            cursor.execute(
+                db.sql("SELECT product_id, MAX(snapshot_id) FROM product_snapshots WHERE job_id = %s GROUP BY product_id"),
+                (job_id,),
+            )
+            stored = dict(cursor.fetchall())
+            snapshots.update((url, stored[ids[url]]) for url in urls if url not in snapshots)
+
+        cursor.executemany(
+            db.sql("INSERT INTO job_results (job_id, position, snapshot_id) VALUES (%s, %s, %s)"),
+            [(job_id, position, snapshots[url]) for position, url in enumerate(urls)],
+        )
+        conn.commit()
+        cursor.close()
+    metrics.db_rows_total.inc(len(urls), table='products')
+    metrics.db_rows_total.inc(len(new_rows), table='product_snapshots')
+    metrics.db_rows_total.inc(len(urls), table='job_results')
+
+
+# Function to list past jobs, newest first
+def list_jobs(site=None, keyword=None, limit=50):
+    query = "SELECT * FROM scrape_jobs WHERE 1 = 1"
+    params = []
+    if site:
+        query += " AND site = %s"
+        params.append(site)
+    if keyword:
+        query += " AND keyword = %s"
+        params.append(normalize_keyword(keyword))
+    query += " ORDER BY created_at DESC LIMIT %s"
+    params.append(int(limit))
+    return _query(query, params)
+
+
+# Function to find the newest finished job of a search
+def latest_job(site, keyword):
+    """The newest finished job of the search whose stored products are all there."""
+    # A job whose stored products don't add up to the count it reports
+    # would be compared on a partial result
+    rows = _query(
+        "SELECT * FROM scrape_jobs j WHERE site = %s AND keyword = %s AND status = %s "
+        "AND product_count = (SELECT COUNT(*) FROM job_results r WHERE r.job_id = j.job_id) "
+        "ORDER BY created_at DESC LIMIT 1",
+        (site, normalize_keyword(keyword), 'finished'),
+    )
+    return rows[0] if rows else None
+
+
+def get_job(job_id):
+    rows = _query("SELECT * FROM scrape_jobs WHERE job_id = %s", (job_id,))
+    return rows[0] if rows else None
+
+
+# Function to fetch the products a job scraped
+def job_products(job_id):
+    rows = _query(
+        "SELECT p.product_url, s.scraped_at, s.data FROM job_results r "
+        "JOIN product_snapshots s ON s.snapshot_id = r.snapshot_id "
+        "JOIN products p ON p.product_id = s.product_id WHERE r.job_id = %s ORDER BY r.position",
+        (job_id,),
+    )
+    return [dict(json.loads(row['data']), product_url=row['product_url']) for row in rows]
+
+
+# Function to fetch every stored snapshot of one product page
+def product_history(product_url, site=None):
+    query = (
+        "SELECT p.site, p.product_url, s.job_id, s.scraped_at, s.data FROM product_snapshots s "
+        "JOIN products p ON p.product_id = s.product_id WHERE p.product_url = %s"
+    )
+    params = [product_url]
+    if site:
+        query += " AND p.site = %s"
+        params.append(site)
+    query += " ORDER BY s.scraped_at DESC"
+    rows = _query(query, params)
+    for row in rows:
+        row['data'] = json.loads(row['data'])
+    return rows
+
+
+def _in_clause(values):
+    return ', '.join(['%s'] * len(values))
+
+
+# Function to fetch the most recent snapshot of each product page
+def latest_snapshots(site, product_urls):
+    """Return ``{url: product_dict}`` with the newest stored snapshot of each URL."""
+    if not product_urls:
+        return {}
+    product_urls = list(product_urls)
+    rows = _query(
+        "SELECT p.product_url, s.data FROM product_snapshots s JOIN products p ON p.product_id = s.product_id "
+        "WHERE s.snapshot_id IN (SELECT MAX(s2.snapshot_id) FROM product_snapshots s2 "
+        "JOIN products p2 ON p2.product_id = s2.product_id "
+        f"WHERE p2.site = %s AND p2.product_url IN ({_in_clause(product_urls)}) GROUP BY s2.product_id)",
+        [site] + product_urls,
+    )
+    return {row['product_url']: json.loads(row['data']) for row in rows}
+
+
+# Function to fetch the stored fingerprints of product pages
+def load_fingerprints(site, product_urls):
+    if not product_urls:
+        return {}
+    product_urls = list(product_urls)
+    rows = _query(
+        "SELECT product_url, fingerprint, etag, last_modified FROM product_fingerprints "
+        f"WHERE site = %s AND product_url IN ({_in_clause(product_urls)})",
+        [site] + product_urls,
+    )
+    return {row['product_url']: row for row in rows}
+
+
+# Function to store the latest fingerprints of product pages
+def save_fingerprints(site, fingerprints):
+    """Replace the stored state for each ``{url: {'fingerprint', 'etag', 'last_modified'}}``."""
+    if not fingerprints:
+        return
+    init_schema()
+    now = _now()
+    product_urls = list(fingerprints)
+    with db.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            db.sql(f"DELETE FROM product_fingerprints WHERE site = %s AND product_url IN ({_in_clause(product_urls)})"),
+            [site] + product_urls,
+        )
+        cursor.executemany(
+            db.sql("INSERT INTO product_fingerprints (site, product_url, fingerprint, etag, last_modified, checked_at) "
+                   "VALUES (%s, %s, %s, %s, %s, %s)"),
+            [(site, url, state['fingerprint'], state.get('etag'), state.get('last_modified'), now)
+             for url, state in fingerprints.items()],
+        )
+        conn.commit()
+        cursor.close()
+    metrics.db_rows_total.inc(len(fingerprints), table='product_fingerprints')
+
+
+# Function to record which product URLs a search returned
+def save_search_snapshot(job_id, site, keyword, num_products, product_urls, diff=None):
+    _execute(
+        "INSERT INTO search_snapshots (job_id, site, keyword, num_products, product_urls, diff, taken_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        (job_id, site, normalize_keyword(keyword), num_products, json.dumps(product_urls),
+         json.dumps(diff) if diff is not None else None, _now()),
+    )
+
+
+# Function to fetch the product URLs of the previous run of a search
+def last_search_urls(site, keyword, num_products):
+    """Product URLs of the newest run of the search that asked for the same ``num_products``.
+
+    A run for fewer products only sees the top of the results, so its URLs
+    can't tell which products dropped out of a longer list.
+    """
+    rows = _query(
+        "SELECT product_urls FROM search_snapshots WHERE site = %s AND keyword = %s AND num_products = %s "
+        "ORDER BY taken_at DESC, search_snapshot_id DESC LIMIT 1",
+        (site, normalize_keyword(keyword), int(num_products)),
+    )
+    return json.loads(rows[0]['product_urls']) if rows else None
+
+
+# Function to fetch the new/changed/removed diff an incremental job produced
+def job_diff(job_id):
+    rows = _query("SELECT diff FROM search_snapshots WHERE job_id = %s", (job_id,))
+    return json.loads(rows[0]['diff']) if rows and rows[0]['diff'] else None
@@ -0,0 +1,237 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import config
+import metrics
+
+# Per-domain request scheduling shared by every job in the process. Each
+# domain gets a token bucket whose rate starts at the site's throttle and
+# adapts as requests complete: it creeps up while responses are fast and
+# clean, and is cut back on slow responses, errors and rate-limit
+# statuses. Failed requests are retried with exponential backoff and full
+# jitter (honouring Retry-After), and a circuit breaker stops sending
+# requests to a domain for a while after repeated failures so a site that
+# is blocking us isn't hammered further.
+
+THROTTLED_STATUSES = (429, 503)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while a domain's circuit is open."""
+
+
+class RetryableStatus(Exception):
+    """A response that is worth retrying: rate limited or a server error."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class PermanentError(Exception):
+    """A failure that retrying won't fix (e.g. a 404); it doesn't count against the domain."""
+
+
+class RequestFailed(Exception):
+    """A request that still failed after its retries; the original error is its ``__cause__``."""
+
+
+def _retry_after(headers):
+    try:
+        return float((headers or {}).get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def check_status(status, headers=None):
+    """Raise RetryableStatus or PermanentError for an unsuccessful HTTP ``status``."""
+    if status is None or status < 400:
+        return
+    if status == 429 or status >= 500:
+        raise RetryableStatus(status, _retry_after(headers))
+    raise PermanentError(f"HTTP {status}")
+
+
+class DomainScheduler:
+    """Rate limit, retries and circuit breaker for the requests to one domain."""
+
+    # Additive increase per fast success (requests/sec), multiplicative decreases
+    INCREASE = 0.1
+    SLOW_FACTOR = 0.8
+    FAILURE_FACTOR = 0.5
+
+    def __init__(self, domain, interval, max_rate=config.RATE_MAX, min_rate=config.RATE_MIN,
+                 burst=config.RATE_BURST, target_latency=config.TARGET_LATENCY,
+                 failure_threshold=config.BREAKER_FAILURES, cooldown=config.BREAKER_COOLDOWN):
+        self.domain = domain
+        # An interval of 0 turns rate limiting off for the domain
+        self.rate = 1 / interval if interval > 0 else None
+        self.max_rate = max(max_rate, self.rate or 0)
+        self.min_rate = min(min_rate, self.rate or min_rate)
+        self.burst = max(1, burst)
+        self.target_latency = target_latency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.trips = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+    def _check_circuit(self):
+        if self._opened_at is None:
+            return
+        remaining = self.cooldown - (time.monotonic() - self._opened_at)
+        if remaining > 0:
+            raise CircuitOpenError(f"{self.domain} is failing; not sending requests for another {remaining:.1f}s")
+        # Half-open: a single probe request decides whether the circuit closes
+        if self._probing:
+            raise CircuitOpenError(f"{self.domain} is failing; waiting for a probe request")
+
+    def _take_slot(self):
+        if self._opened_at is not None:
+            self._probing = True
+        self.requests += 1
+
+    def acquire(self):
+        """Wait for a request slot. Raises CircuitOpenError while the circuit is open."""
+        while True:
+            with self._lock:
+                self._check_circuit()
+                if self.rate is None:
+                    self._take_slot()
+                    return
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._take_slot()
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def record_success(self, seconds):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"{self.domain}: requests are succeeding again, closing the circuit")
+            self._opened_at = None
+            self._probing = False
+            self._consecutive_failures = 0
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            if self.rate is not None:
+                if seconds > self.target_latency:
+                    self.rate = max(self.min_rate, self.rate * self.SLOW_FACTOR)
+                else:
+                    self.rate = min(self.max_rate, self.rate + self.INCREASE)
+
+    def record_failure(self, throttled=False):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self.rate is not None:
+                self.rate = max(self.min_rate, self.rate * self.FAILURE_FACTOR)
+                if throttled:
+                    # The site asked us to slow down: give up the saved-up burst too
+                    self._tokens = min(self._tokens, 0.0)
+            probe_failed = self._probing
+            self._probing = False
+            if probe_failed or self._consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.trips += 1
+                    metrics.circuit_trips_total.inc(domain=self.domain)
+                    print(f"{self.domain}: {self._consecutive_failures} failures in a row, opening the circuit")
+                self._opened_at = time.monotonic()
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number ``attempt + 1``: exponential with full jitter."""
+        delay = random.uniform(0, min(config.BACKOFF_MAX, config.BACKOFF_BASE * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, config.BACKOFF_MAX))
+        return delay
+
+    def call(self, fn, retries=config.RETRIES):
+        """Run ``fn()`` in a request slot, retrying failures up to ``retries`` times.
+
+        Returns what ``fn`` returns. Raises CircuitOpenError if the domain's
+        circuit is open, or RequestFailed from the last error once the
+        retries are used up, so callers don't retry it again. PermanentError
+        is raised straight away.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            start = time.monotonic()
+            try:
+                result = fn()
+            except PermanentError:
+                with self._lock:
+                    self._probing = False
+                raise
+            except Exception as e:
+                throttled = isinstance(e, RetryableStatus) and e.status in THROTTLED_STATUSES
+                self.record_failure(throttled=throttled)
+                if attempt >= retries:
+                    raise RequestFailed(str(e)) from e
+                delay = self.backoff(attempt, getattr(e, 'retry_after', None))
+                with self._lock:
+                    self.retries += 1
+                metrics.retries_total.inc(domain=self.domain)
+                print(f"{self.domain}: attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.record_success(time.monotonic() - start)
+                return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'domain': self.domain,
+                'state': self.state,
+                'rate': round(self.rate, 3) if self.rate is not None else None,
+                'latency': round(self.latency, 3) if self.latency is not None else None,
+                'requests': self.requests,
+                'failures': self.failures,
+                'retries': self.retries,
+                'trips': self.trips,
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def for_url(url, interval=config.THROTTLE_SECONDS):
+    """The scheduler of ``url``'s domain, created with ``interval`` on first use."""
+    domain = urlparse(url).netloc.lower()
+    with _schedulers_lock:
+        scheduler = _schedulers.get(domain)
+        if scheduler is None:
+            scheduler = _schedulers[domain] = DomainScheduler(domain, interval)
+        return scheduler
+
+
+def for_site(site):
+    return for_url(site.base_url, config.site_throttle(site.name))
+
+
+def stats():
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [scheduler.stats() for scheduler in schedulers]
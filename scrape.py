@@ -0,0 +1,16 @@
+import sys
+
+from engine import run_scrape
+from sites import get_site
+
+# Command line entry point for every registered site
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python scrape.py <site> <keyword> <num_products>")
+        sys.exit(1)
+
+    site = get_site(sys.argv[1])
+    keyword = sys.argv[2]
+    num_products = int(sys.argv[3])
+
+    run_scrape(site, keyword, num_products)
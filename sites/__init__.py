@@ -0,0 +1,32 @@
+# Registry of the retail sites the app can scrape. Adding a retailer means
+# writing a Site subclass in this package and registering it below.
+
+from sites import scrubharvard, uniformadvantage, wearfigs
+
+SITES = {}
+ALIASES = {}
+
+
+def register(site, aliases=()):
+    SITES[site.name] = site
+    for alias in aliases:
+        ALIASES[alias] = site.name
+    return site
+
+
+def get_site(name):
+    """Return the registered site called ``name`` (or one of its aliases)."""
+    site = SITES.get(ALIASES.get(name, name))
+    if site is None:
+        raise ValueError(f"Unknown site: {name}")
+    return site
+
+
+def all_sites():
+    return list(SITES.values())
+
+
+# The scraper_N aliases are the values the form has always posted
+register(uniformadvantage.SITE, aliases=('scraper_1',))
+register(wearfigs.SITE, aliases=('scraper_2',))
+register(scrubharvard.SITE, aliases=('scraper_3',))
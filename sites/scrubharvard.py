@@ -0,0 +1,79 @@
+import http_fastpath
+from engine import Site
+
+
+class ScrubHarvard(Site):
+    name = 'scrubharvard'
+    title = 'Scrub Harvard'
+    base_url = 'https://www.scrubharvard.com/'
+    name_field = 'product_name'
+    ready_selector = 'h1.product-single__title'
+    result_selector = 'li.grid__item.js-col'
+    next_page_selector = '.pagination .next a, a[rel="next"]'
+    log_table = 'Scrub_harvard_log'
+
+    # The variant pickers are rendered by theme JavaScript, but the product
+    # JSON the theme embeds has every color and size
+    http_required_fields = ('product_name', 'price')
+
+    product_fields = {
+        'product_name': {'selector': 'h1.product-single__title', 'default': 'N/A'},
+        'price': {'selector': 'span.product-single__price', 'default': 'N/A'},
+        'discount': {'selector': 'p.product__text', 'default': 'No Discount'},
+        'available_colors': {'selector': 'fieldset[name="color"] input[type="radio"]', 'attribute': 'value', 'all': True, 'default': ''},
+        'available_sizes': {'selector': 'fieldset[name="size"] input[type="radio"]', 'attribute': 'value', 'all': True, 'default': ''},
+        'free_shipping_available': {'selector': 'div.iwt-item__text', 'default': 'Not Available'},
+        'features': {'selector': '#gtabb69a53cf-5bc1-4b18-add3-92af436f966c ul li', 'all': True, 'default': ''},
+        'care_details': {'selector': '#gtabf4c1b859-6506-4354-b686-25d6efffda01', 'default': 'N/A'},
+    }
+
+    normalized_fields = {
+        'name': 'product_name',
+        'price': 'price',
+        'colors': 'available_colors',
+        'sizes': 'available_sizes',
+    }
+
+    index_fields = {
+        'name': ['product_name'],
+        'features': ['features'],
+        'materials': ['care_details'],
+        'colors': ['available_colors'],
+        'sizes': ['available_sizes'],
+    }
+
+    def search(self, page, keyword):
+        self.goto(page, self.base_url)
+
+        # Open the search modal from the header
+        page.click('#shopify-section-sections--22071753048384__header > header > div > div > div > div > div > div.header-bottom__right.col-bottom__right > div.site-header__search-wrap.sidebar__search > details-modal > div > div.header__icon.header__icon--search.header__icon--summary.focus-inset.modal__toggle > span > span > span')
+        page.wait_for_selector('#Search-In-Modal')
+
+        page.fill('#Search-In-Modal', keyword)
+        page.press('#Search-In-Modal', 'Enter')
+        page.wait_for_selector('li.grid__item.js-col')
+
+    def http_extract(self, document, product):
+        data = http_fastpath.embedded_json(document, 'script[id^="ProductJson"], script[data-product-json]')
+        if not data:
+            return product
+        for option_index, option in enumerate(data.get('options') or []):
+            # product.json lists option names; product.js lists {name, values}
+            name = option.get('name') if isinstance(option, dict) else option
+            field = {'color': 'available_colors', 'size': 'available_sizes'}.get(str(name).lower())
+            if field is None or product.get(field):
+                continue
+            key = f"option{option_index + 1}"
+            values = option.get('values') if isinstance(option, dict) else None
+            if values is None:
+                values = [variant.get(key) for variant in data.get('variants') or []]
+            product[field] = ', '.join(dict.fromkeys(value for value in values if value))
+        return product
+
+    def post_process(self, product):
+        # Only the presence of the free shipping banner is kept
+        product['free_shipping_available'] = 'Free shipping' in product['free_shipping_available']
+        return product
+
+
+SITE = ScrubHarvard()
@@ -0,0 +1,49 @@
+from engine import Site
+
+
+class UniformAdvantage(Site):
+    name = 'uniformadvantage'
+    title = 'Uniform Advantage'
+    base_url = 'https://www.uniformadvantage.com/'
+    name_field = "Product Name"
+    ready_selector = 'h1.product-name'
+    result_selector = 'div.product-grid .product'
+    load_more_selector = 'div.show-more button.more'
+    log_table = 'Uniform_Advantage_log'
+
+    # The accordion bodies are already in the DOM, so the fabric and fit
+    # sections don't need to be clicked open before reading them
+    product_fields = {
+        "Style Number": {'selector': 'div.product-number .product-id', 'required': True},
+        "Product Name": {'selector': 'h1.product-name', 'required': True},
+        "Rating": {'selector': 'span.sr-only', 'default': "No rating available"},
+        "Reviews": {'selector': 'span.rating-number', 'default': "No reviews"},
+        "Current Price": {'selector': 'div.product-price-ratings .price .value', 'default': "Price not available"},
+        "Original Price": {'selector': 'div.product-price-ratings .strike-through.list .value', 'default': "No original price available"},
+        "Fabric Details": {'selector': 'div#fabric .card-body ul', 'default': "Fabric details not available"},
+        "Fit & Size Details": {'selector': 'div#fit-and-size .card-body', 'default': "Fit & size details not available"},
+    }
+
+    normalized_fields = {
+        'name': "Product Name",
+        'price': "Current Price",
+        'original_price': "Original Price",
+        'rating': "Rating",
+        'reviews': "Reviews",
+    }
+
+    index_fields = {
+        'name': ["Product Name", "Style Number"],
+        'features': ["Fit & Size Details"],
+        'materials': ["Fabric Details"],
+    }
+
+    def search(self, page, keyword):
+        self.goto(page, self.base_url)
+        search_box = page.query_selector('#search')
+        search_box.fill(keyword)
+        search_box.press('Enter')
+        page.wait_for_selector('div.product-grid')
+
+
+SITE = UniformAdvantage()
@@ -0,0 +1,61 @@
+from engine import Site
+
+
+class WearFigs(Site):
+    name = 'wearfigs'
+    title = 'Wear Figs'
+    base_url = 'https://www.wearfigs.com/'
+    name_field = "Product Name"
+    ready_selector = 'h1.Reviews__Title-sc-1ad046a-20'
+    result_selector = '.Collection__StyledGridItem-sc-1ustqhb-1.gQZWxk'
+    infinite_scroll = True
+
+    # Product pages are rendered client side, so the HTML never has the
+    # fields and a plain HTTP fetch would only cost a request per product
+    http_fast_path = False
+
+    product_fields = {
+        "Product Name": {'selector': 'h1.Reviews__Title-sc-1ad046a-20', 'required': True},
+        "Rating": {'selector': '.Reviews__ReviewStars-sc-1ad046a-50', 'attribute': 'aria-label', 'default': "No rating available"},
+        "Reviews": {'selector': '.Reviews__ReviewCountTextHeader-sc-1ad046a-10', 'default': "No reviews"},
+        "Current Price": {'selector': 'span.ProductHighlights__Price-sc-soy3od-5', 'default': "Price not available"},
+        "Available Sizes": {'selector': 'button[role="button"]', 'all': True, 'join': "; ", 'default': ""},
+        "Details & Fit": {'selector': '.ProductDetailsAccordionSection__FeaturesWrapper-sc-1fnl6ky-6.izBubJ', 'all': True, 'join': "; ", 'default': ""},
+        "Fabric & Care Instructions": {'selector': '.ProductDetailsAccordionSection__RawMaterials-sc-1fnl6ky-3.bgHrpi', 'default': "Care instructions not available"},
+    }
+
+    normalized_fields = {
+        'name': "Product Name",
+        'price': "Current Price",
+        'sizes': "Available Sizes",
+        'rating': "Rating",
+        'reviews': "Reviews",
+    }
+
+    index_fields = {
+        'name': ["Product Name"],
+        'features': ["Details & Fit"],
+        'materials': ["Fabric & Care Instructions"],
+        'sizes': ["Available Sizes"],
+    }
+
+    def search(self, page, keyword):
+        self.goto(page, self.base_url)
+
+        # The OneTrust cookie banner is blocked with the other trackers;
+        # dismiss it only if it was allowed to load
+        cookie_banner = page.query_selector('#onetrust-reject-all-handler')
+        if cookie_banner:
+            cookie_banner.click()
+        page.click('#nav-tab-search button')
+
+        # Wait for the search overlay, then submit the keyword
+        page.wait_for_selector('.SearchOverlay__ExpansionPanelWrapper-sc-1nghzfs-0', timeout=10000)
+        page.fill('input[name="searchText"]', keyword)
+        page.press('input[name="searchText"]', 'Enter')
+
+        # Wait for the initial search results to load
+        page.wait_for_selector(self.result_selector, timeout=10000)
+
+
+SITE = WearFigs()
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The tests run against the SQLite stand-in and keep every file they
+# write out of the repository. The settings are read when config is
+# imported, so they are set before any project module is loaded.
+_workdir = tempfile.mkdtemp(prefix='scraper-tests-')
+os.environ['SCRAPER_DB_BACKEND'] = 'sqlite'
+os.environ['SCRAPER_SQLITE_PATH'] = os.path.join(_workdir, 'scrapefly.db')
+os.environ['SCRAPER_INDEX_PATH'] = os.path.join(_workdir, 'product_index.db')
+os.environ['SCRAPER_JOB_STORE_PATH'] = os.path.join(_workdir, 'jobs.db')
+os.environ['SCRAPER_CHECKPOINT_DIR'] = os.path.join(_workdir, 'checkpoints')
+os.environ['SCRAPER_DOWNLOAD_CACHE_DIR'] = os.path.join(_workdir, 'download_cache')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import db  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A fresh SQLite results database and connection pool for one test."""
+    monkeypatch.setattr(config, 'SQLITE_PATH', str(tmp_path / 'scrapefly.db'))
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, '_sqlite_tables', set())
+    monkeypatch.setattr(db, '_log_buffer', None)
+    return config.SQLITE_PATH
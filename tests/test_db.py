@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT log_message FROM {table} ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+
+def test_pool_reuses_connections():
+    opened = []
+    pool = db.ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert second is first
+    assert len(opened) == 1
+
+
+def test_pool_discards_connection_that_raised():
+    opened = []
+    pool = db.ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], size=2)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as broken:
+            raise RuntimeError("query failed")
+    with pool.connection() as conn:
+        pass
+
+    assert broken.closed
+    assert conn is not broken
+    assert len(opened) == 2
+
+
+def test_pool_limits_open_connections():
+    pool = db.ConnectionPool(FakeConnection, size=1)
+    entered = threading.Event()
+
+    def hold():
+        with pool.connection():
+            entered.set()
+
+    with pool.connection():
+        thread = threading.Thread(target=hold)
+        thread.start()
+        assert not entered.wait(0.2)
+    thread.join(timeout=5)
+    assert entered.is_set()
+
+
+def test_execute_many_inserts_rows(sqlite_db):
+    db.execute_many('scrape_log', ['log_message', 'log_timestamp'],
+                    [('first', '2024-01-01 00:00:00'), ('second', '2024-01-01 00:00:01')])
+
+    assert rows(sqlite_db, 'scrape_log') == [('first',), ('second',)]
+
+
+def test_execute_many_without_rows_does_nothing(sqlite_db):
+    db.execute_many('scrape_log', ['log_message', 'log_timestamp'], [])
+
+    conn = sqlite3.connect(sqlite_db)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'scrape_log'").fetchall() == []
+    conn.close()
+
+
+def test_log_buffer_flushes_when_full(sqlite_db):
+    buffer = db.LogBuffer(batch_size=3, flush_seconds=60)
+    buffer.add('scrape_log', 'one')
+    buffer.add('scrape_log', 'two')
+    time.sleep(0.2)
+    assert buffer._lines
+
+    buffer.add('scrape_log', 'three')
+    deadline = time.monotonic() + 5
+    while buffer._lines and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with buffer._flush_lock:
+        pass
+
+    assert rows(sqlite_db, 'scrape_log') == [('one',), ('two',), ('three',)]
+
+
+def test_log_buffer_flushes_after_interval(sqlite_db):
+    buffer = db.LogBuffer(batch_size=100, flush_seconds=0.2)
+    buffer.add('scrape_log', 'waiting')
+
+    deadline = time.monotonic() + 5
+    while buffer._lines and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # The flusher may have taken the line and still be writing it
+    with buffer._flush_lock:
+        pass
+
+    assert rows(sqlite_db, 'scrape_log') == [('waiting',)]
+
+
+def test_log_buffer_writes_each_table(sqlite_db):
+    buffer = db.LogBuffer(batch_size=100, flush_seconds=60)
+    buffer.add('wearfigs_log', 'figs')
+    buffer.add('scrubharvard_log', 'harvard')
+    buffer.flush()
+
+    assert rows(sqlite_db, 'wearfigs_log') == [('figs',)]
+    assert rows(sqlite_db, 'scrubharvard_log') == [('harvard',)]
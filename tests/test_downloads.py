@@ -0,0 +1,86 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+import config
+import downloads
+
+app = Flask(__name__)
+
+CONTENT = b"product_url,Product Name\n" + b"".join(b"https://example.com/p/%d,Scrub top %d\n" % (n, n) for n in range(200))
+
+
+@pytest.fixture
+def export_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'DOWNLOAD_CACHE_DIR', str(tmp_path / 'download_cache'))
+    path = tmp_path / 'scraped_products_wearfigs_0123456789ab.csv'
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+def send(path, headers=None):
+    with app.test_request_context(headers=headers or {}):
+        response = downloads.send(path)
+        response.direct_passthrough = False
+        return response
+
+
+def test_plain_download_has_validators(export_file):
+    response = send(export_file)
+
+    assert response.status_code == 200
+    assert response.get_data() == CONTENT
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'Content-Encoding' not in response.headers
+    assert 'attachment' in response.headers['Content-Disposition']
+
+
+def test_unchanged_file_is_not_modified(export_file):
+    etag = send(export_file).headers['ETag']
+
+    response = send(export_file, {'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+
+def test_range_request(export_file):
+    response = send(export_file, {'Range': 'bytes=0-9'})
+
+    assert response.status_code == 206
+    assert response.get_data() == CONTENT[:10]
+    assert response.headers['Content-Range'] == f"bytes 0-9/{len(CONTENT)}"
+
+
+def test_gzip_for_clients_that_accept_it(export_file):
+    response = send(export_file, {'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == CONTENT
+    assert response.headers['ETag'] != send(export_file).headers['ETag']
+
+
+def test_gzipped_copy_is_not_modified(export_file):
+    etag = send(export_file, {'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    response = send(export_file, {'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+
+def test_changed_file_gets_a_new_gzipped_copy(export_file):
+    first = downloads.gzipped(export_file)
+    with open(export_file, 'ab') as file:
+        file.write(b"https://example.com/p/extra,Extra\n")
+
+    second = downloads.gzipped(export_file)
+
+    assert second != first
+    with gzip.open(second) as file:
+        assert file.read().endswith(b"Extra\n")
+    assert not os.path.exists(first)
@@ -0,0 +1,16 @@
+import os
+import time
+
+import config
+import export
+
+
+def test_evict_keeps_combined_multi_site_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'STATIC_DIR', str(tmp_path))
+    old = time.time() - 3600
+    for name in ('scraped_products_wearfigs_0123456789ab.csv', 'scraped_products_all_0123456789ab.csv', 'notes.txt'):
+        (tmp_path / name).write_text('x')
+        os.utime(tmp_path / name, (old, old))
+
+    assert export.evict(max_age=60, limit=0) == 1
+    assert sorted(os.listdir(tmp_path)) == ['notes.txt', 'scraped_products_all_0123456789ab.csv']
@@ -0,0 +1,104 @@
+import pytest
+
+import http_fastpath
+from fixture_server import FixtureServer, product
+from sites import get_site
+
+pytestmark = pytest.mark.skipif(not http_fastpath.available(), reason="requests and lxml are not installed")
+
+
+@pytest.fixture(scope='module')
+def fixtures():
+    # Only the page renderer is used; the server is never started
+    server = FixtureServer()
+    yield server
+    server._httpd.server_close()
+
+
+def parse(markup):
+    return http_fastpath.lxml_html.fromstring(markup)
+
+
+def product_page(fixtures, site_name, number):
+    return parse(fixtures._product_page(site_name, number))
+
+
+def test_inner_text_puts_blocks_on_their_own_lines():
+    element = parse("<div><p>First   line</p><ul><li>One</li><li>Two</li></ul>tail <b>bold</b> text</div>")
+
+    assert http_fastpath._inner_text(element) == "First line\nOne\nTwo\ntail bold text"
+
+
+def test_inner_text_skips_hidden_tags():
+    element = parse("<div>Shown<script>var hidden = 1;</script> text<style>p {}</style><!-- note --> here</div>")
+
+    assert http_fastpath._inner_text(element) == "Shown text here"
+
+
+def test_extract_html_reads_server_rendered_fields(fixtures):
+    site = get_site('uniformadvantage')
+    item = product(4)
+
+    result = http_fastpath.extract_html(product_page(fixtures, site.name, 4), site.product_fields)
+
+    assert result["Style Number"] == item['style']
+    assert result["Product Name"] == item['name']
+    assert result["Current Price"] == item['price']
+    assert result["Original Price"] == item['original_price']
+    assert result["Rating"] == f"{item['rating']} out of 5 stars"
+    assert result["Fabric Details"] == f"{item['fabric']}\nMachine wash cold"
+    assert http_fastpath.missing_fields(site, result) == []
+
+
+def test_extract_html_uses_defaults_and_joins_lists():
+    fields = {
+        'title': {'selector': 'h1', 'default': 'N/A'},
+        'sizes': {'selector': 'button', 'all': True, 'join': '; ', 'default': ''},
+        'link': {'selector': 'a', 'attribute': 'href', 'default': None},
+    }
+
+    result = http_fastpath.extract_html(parse("<div><button>S</button><button> </button><button>M</button></div>"), fields)
+
+    assert result == {'title': 'N/A', 'sizes': 'S; M', 'link': None}
+
+
+def test_client_rendered_page_falls_back_to_the_browser(fixtures):
+    site = get_site('wearfigs')
+
+    result = http_fastpath.extract_html(product_page(fixtures, site.name, 1), site.product_fields)
+
+    assert http_fastpath.missing_fields(site, result) == ["Product Name"]
+    # so the site doesn't try the fast path at all
+    assert not http_fastpath.enabled(site)
+
+
+def test_default_value_counts_as_missing():
+    site = get_site('scrubharvard')
+
+    missing = http_fastpath.missing_fields(site, {'product_name': 'N/A', 'price': '$20.99'})
+
+    assert missing == ['product_name']
+
+
+def test_scrubharvard_reads_options_from_product_json(fixtures):
+    site = get_site('scrubharvard')
+    item = product(5)
+    document = product_page(fixtures, site.name, 5)
+
+    result = site.http_extract(document, http_fastpath.extract_html(document, site.product_fields))
+
+    assert result['product_name'] == item['name']
+    assert result['price'] == item['price']
+    assert result['available_colors'] == ', '.join(item['colors'])
+    assert result['available_sizes'] == ', '.join(item['sizes'])
+    assert http_fastpath.missing_fields(site, result) == []
+
+
+def test_scrubharvard_accepts_product_js_options():
+    site = get_site('scrubharvard')
+    document = parse('<div><script type="application/json" id="ProductJson-1">'
+                     '{"options": [{"name": "Size", "values": ["S", "M"]}]}</script></div>')
+
+    result = site.http_extract(document, {'available_sizes': '', 'available_colors': 'Navy'})
+
+    assert result == {'available_sizes': 'S, M', 'available_colors': 'Navy'}
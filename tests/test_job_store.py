@@ -0,0 +1,121 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import job_store
+from job_store import FAILED, FINISHED, QUEUED, RUNNING
+
+
+@pytest.fixture(params=['sqlite', 'database'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return job_store.SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    request.getfixturevalue('sqlite_db')
+    return job_store.DatabaseJobStore()
+
+
+def new_job(site='wearfigs', **fields):
+    return dict({'job_id': uuid.uuid4().hex, 'site': site, 'status': QUEUED, 'created_at': time.time()}, **fields)
+
+
+def test_submit_attaches_to_the_same_search(store):
+    first = store.submit(new_job(), ('wearfigs', 'scrubs', 5))
+    second = store.submit(new_job(), ('wearfigs', 'scrubs', 5))
+    other = store.submit(new_job(), ('wearfigs', 'jogger', 5))
+
+    assert second['job_id'] == first['job_id']
+    assert second['subscribers'] == 2
+    assert other['job_id'] != first['job_id']
+    assert store.count(QUEUED) == 2
+
+
+def test_refresh_does_not_attach_to_a_cached_job(store):
+    cached = store.submit(new_job(), ('wearfigs', 'scrubs', 5))
+    refresh = store.submit(new_job(use_cache=False), ('wearfigs', 'scrubs', 5), use_cache=False)
+    again = store.submit(new_job(use_cache=False), ('wearfigs', 'scrubs', 5), use_cache=False)
+
+    assert refresh['job_id'] != cached['job_id']
+    assert again['job_id'] == refresh['job_id']
+
+
+def test_concurrent_submits_queue_one_job(store):
+    job_ids = []
+
+    def submit():
+        job_ids.append(store.submit(new_job(), ('wearfigs', 'scrubs', 5))['job_id'])
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(job_ids)) == 1
+    assert store.get(job_ids[0])['subscribers'] == 8
+
+
+def test_each_job_is_claimed_once(store):
+    jobs = [new_job(created_at=time.time() + position) for position in range(5)]
+    store.create(jobs)
+    claimed = []
+
+    def claim(worker):
+        while True:
+            job = store.claim(worker)
+            if job is None:
+                return
+            claimed.append(job['job_id'])
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{number}",)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job['job_id'] for job in jobs)
+    assert store.count(RUNNING) == 5
+
+
+def test_claim_skips_children(store):
+    parent = new_job()
+    store.create([parent, new_job(parent_id=parent['job_id'])])
+
+    assert store.claim('worker')['job_id'] == parent['job_id']
+    assert store.claim('worker') is None
+
+
+def test_fail_stale_fails_running_jobs(store):
+    running, queued = new_job(), new_job()
+    store.create([running, queued])
+    store.claim('worker')
+
+    assert store.fail_stale(max_age=-1) == [running['job_id']]
+    assert store.get(running['job_id'])['status'] == FAILED
+    assert store.events(running['job_id'])[-1][1]['event'] == 'error'
+    assert store.get(queued['job_id'])['status'] == QUEUED
+    assert store.fail_stale(max_age=-1) == []
+
+
+def test_prune_deletes_only_ended_jobs(store):
+    finished, failed, queued = new_job(), new_job(), new_job()
+    store.create([finished, failed, queued])
+    for job, status in ((finished, FINISHED), (failed, FAILED)):
+        store.save(dict(job, status=status))
+        store.add_event(job['job_id'], {'event': 'done'})
+
+    assert store.prune(max_age=3600) == 0
+    assert store.prune(max_age=-1) == 2
+    assert store.get(finished['job_id']) is None
+    assert store.events(failed['job_id']) == []
+    assert store.get(queued['job_id'])['status'] == QUEUED
+
+
+def test_active(store):
+    finished, queued = new_job(), new_job()
+    store.create([finished, queued])
+    store.save(dict(finished, status=FINISHED))
+
+    assert store.active([finished['job_id'], queued['job_id'], 'missing']) == {queued['job_id']}
+    assert store.active([]) == set()
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from normalize import COLUMNS, normalize, normalize_frame
+from sites import get_site
+
+PRODUCTS = [
+    {'product_url': 'https://www.wearfigs.com/p/1', "Product Name": "  Casma   Scrub Top ", "Current Price": "$1,029.99",
+     "Available Sizes": "XS; S; S; M", "Rating": "4.8 out of 5 stars", "Reviews": "(1,204)"},
+    {'product_url': 'https://www.wearfigs.com/p/2', "Product Name": "Zamora Jogger", "Current Price": "Price not available",
+     "Available Sizes": "", "Rating": "No rating available", "Reviews": "No reviews"},
+    {'product_url': 'https://www.wearfigs.com/p/3', "Product Name": "Kade Cargo", "Current Price": "$38",
+     "Available Sizes": "L;\nXL", "Rating": "5 stars", "Reviews": "12 reviews"},
+]
+
+
+def scalar(value):
+    return None if not isinstance(value, list) and pd.isna(value) else value
+
+
+@pytest.mark.parametrize('position', range(len(PRODUCTS)))
+def test_normalize_frame_matches_normalize(position):
+    site = get_site('wearfigs')
+    product = PRODUCTS[position]
+    row = normalize_frame(site, PRODUCTS).iloc[position]
+
+    expected = normalize(site, product['product_url'], product)
+    assert {column: scalar(row[column]) for column in COLUMNS} == expected
+
+
+def test_normalize_frame_types():
+    frame = normalize_frame(get_site('wearfigs'), PRODUCTS)
+
+    assert frame['price'].dtype == 'float64'
+    assert frame['reviews'].dtype == 'Int64'
+    assert frame['sizes'].tolist() == [['XS', 'S', 'M'], [], ['L', 'XL']]
+    assert frame['sizes'][1] is not frame['colors'][1]
@@ -0,0 +1,57 @@
+import pytest
+
+import results_store
+
+
+@pytest.fixture
+def store(sqlite_db, monkeypatch):
+    monkeypatch.setattr(results_store, '_schema_ready', False)
+    return results_store
+
+
+def products(values):
+    return [(f"https://example.com/p/{number}", {'name': value}) for number, value in enumerate(values)]
+
+
+def test_job_products_in_result_order(store):
+    store.save_products('job1', 'site', products(['a', 'b', 'c']), name_field='name')
+
+    assert [product['name'] for product in store.job_products('job1')] == ['a', 'b', 'c']
+
+
+def test_incremental_job_keeps_unchanged_products(store):
+    store.save_products('job1', 'site', products(['a', 'b', 'c']), name_field='name')
+    changed = products(['a', 'B', 'c'])
+
+    store.save_products('job2', 'site', changed, name_field='name', changed={changed[1][0]})
+
+    assert [product['name'] for product in store.job_products('job2')] == ['a', 'B', 'c']
+    assert [product['name'] for product in store.job_products('job1')] == ['a', 'b', 'c']
+    assert len(store.product_history(changed[1][0])) == 2
+    assert len(store.product_history(changed[0][0])) == 1
+
+
+def test_unchanged_product_without_snapshot_is_stored(store):
+    store.save_products('job1', 'site', products(['a']), name_field='name', changed=set())
+
+    assert [product['name'] for product in store.job_products('job1')] == ['a']
+
+
+def test_last_search_urls_matches_num_products(store):
+    store.save_search_snapshot('job1', 'site', 'Scrub Top', 10, ['1', '2'])
+    store.save_search_snapshot('job2', 'site', 'scrub top', 5, ['1'])
+
+    assert store.last_search_urls('site', 'scrub top', 10) == ['1', '2']
+    assert store.last_search_urls('site', 'scrub top', 5) == ['1']
+    assert store.last_search_urls('site', 'scrub top', 3) is None
+
+
+def test_latest_job_skips_jobs_with_missing_products(store):
+    store.start_job('job1', 'site', 'scrub top', 2)
+    store.save_products('job1', 'site', products(['a', 'b']), name_field='name')
+    store.finish_job('job1', 'finished', product_count=2)
+    store.start_job('job2', 'site', 'scrub top', 2)
+    store.save_products('job2', 'site', products(['a']), name_field='name')
+    store.finish_job('job2', 'finished', product_count=2)
+
+    assert store.latest_job('site', 'Scrub Top')['job_id'] == 'job1'
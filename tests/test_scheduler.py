@@ -0,0 +1,159 @@
+import pytest
+
+import config
+import scheduler
+from scheduler import CircuitOpenError, DomainScheduler, PermanentError, RequestFailed, RetryableStatus
+
+
+class Clock:
+    """Stands in for the time module so waits advance a fake clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, 'time', clock)
+    return clock
+
+
+def failing(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_token_bucket_spends_the_burst_then_waits(clock):
+    domain = DomainScheduler('example.com', interval=0.5, burst=2)
+
+    for _ in range(3):
+        domain.acquire()
+
+    assert clock.sleeps == [pytest.approx(0.5)]
+    assert domain.requests == 3
+
+
+def test_no_interval_never_waits(clock):
+    domain = DomainScheduler('example.com', interval=0)
+
+    for _ in range(10):
+        domain.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_rate_adapts_to_latency_and_failures(clock):
+    domain = DomainScheduler('example.com', interval=1, target_latency=1, max_rate=5, min_rate=0.1)
+
+    domain.record_success(0.1)
+    assert domain.rate == pytest.approx(1.1)
+    domain.record_success(2)
+    assert domain.rate == pytest.approx(1.1 * DomainScheduler.SLOW_FACTOR)
+    domain.record_failure()
+    assert domain.rate == pytest.approx(1.1 * DomainScheduler.SLOW_FACTOR * DomainScheduler.FAILURE_FACTOR)
+
+
+def test_backoff_is_capped_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda low, high: high)
+    domain = DomainScheduler('example.com', interval=0)
+
+    assert domain.backoff(0) == config.BACKOFF_BASE
+    assert domain.backoff(1) == min(config.BACKOFF_MAX, config.BACKOFF_BASE * 2)
+    assert domain.backoff(50) == config.BACKOFF_MAX
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda low, high: low)
+    assert domain.backoff(0, retry_after=config.BACKOFF_MAX / 2) == config.BACKOFF_MAX / 2
+    assert domain.backoff(0, retry_after=config.BACKOFF_MAX * 10) == config.BACKOFF_MAX
+
+
+def test_call_retries_then_succeeds(clock):
+    domain = DomainScheduler('example.com', interval=0)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RetryableStatus(503)
+        return 'ok'
+
+    assert domain.call(fn, retries=3) == 'ok'
+    assert len(attempts) == 3
+    assert domain.retries == 2
+    assert len(clock.sleeps) == 2
+
+
+def test_call_gives_up_after_the_retries(clock):
+    domain = DomainScheduler('example.com', interval=0, failure_threshold=10)
+
+    with pytest.raises(RequestFailed) as error:
+        domain.call(failing(RetryableStatus(500)), retries=2)
+
+    assert isinstance(error.value.__cause__, RetryableStatus)
+    assert domain.failures == 3
+
+
+def test_permanent_errors_are_not_retried(clock):
+    domain = DomainScheduler('example.com', interval=0)
+
+    with pytest.raises(PermanentError):
+        domain.call(failing(PermanentError("HTTP 404")), retries=3)
+
+    assert domain.failures == 0
+    assert clock.sleeps == []
+
+
+def test_circuit_opens_after_repeated_failures(clock):
+    domain = DomainScheduler('example.com', interval=0, failure_threshold=3, cooldown=60)
+
+    for _ in range(3):
+        domain.record_failure()
+
+    assert domain.state == 'open'
+    assert domain.trips == 1
+    with pytest.raises(CircuitOpenError):
+        domain.acquire()
+
+
+def test_half_open_circuit_lets_one_probe_through(clock):
+    domain = DomainScheduler('example.com', interval=0, failure_threshold=1, cooldown=60)
+    domain.record_failure()
+    clock.now += 60
+
+    assert domain.state == 'half-open'
+    domain.acquire()
+    with pytest.raises(CircuitOpenError):
+        domain.acquire()
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    domain = DomainScheduler('example.com', interval=0, failure_threshold=1, cooldown=60)
+    domain.record_failure()
+    clock.now += 60
+
+    assert domain.call(lambda: 'ok', retries=0) == 'ok'
+    assert domain.state == 'closed'
+    domain.acquire()
+
+
+def test_failed_probe_opens_the_circuit_again(clock):
+    domain = DomainScheduler('example.com', interval=0, failure_threshold=5, cooldown=60)
+    for _ in range(5):
+        domain.record_failure()
+    clock.now += 60
+
+    with pytest.raises(RequestFailed):
+        domain.call(failing(RetryableStatus(503)), retries=0)
+
+    assert domain.state == 'open'
+    assert domain.trips == 1
+    with pytest.raises(CircuitOpenError):
+        domain.acquire()
@@ -0,0 +1,26 @@
+import sys
+import time
+
+import config
+from jobs import JobManager
+
+# Scrape worker process. Claims queued jobs from the shared job store and
+# runs them, so scraping can be moved out of the web processes and spread
+# over several hosts (run the web app with SCRAPER_JOB_WORKERS=0 then).
+#
+#     python worker.py [threads]
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else config.JOB_WORKERS
+    if threads < 1:
+        print("Usage: python worker.py [threads]  (threads must be at least 1)")
+        sys.exit(1)
+
+    manager = JobManager(max_workers=threads)
+    manager.start()
+    print(f"Worker {manager.worker_id} running {threads} jobs at a time from the {config.JOB_STORE} job store")  # Debugging line
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass